@@ -10,17 +10,22 @@ import time
 import random
 from collections import deque
 from pathlib import Path
-from flask import Flask, request, jsonify, render_template, send_file, send_from_directory, send_file, session, redirect, url_for
+from flask import Flask, request, jsonify, render_template, send_file, send_from_directory, send_file, session, redirect, url_for, Response, stream_with_context
 
 from settings_manager import SettingsManager
 from handy_controller import HandyController
 from llm_service import LLMService
 from audio_service import AudioService
+from memory_consolidator import MemoryConsolidator
+from event_bus import EventBus, format_sse
+from tts_worker_pool import TTSWorkerPool
+from tts_cache import TTSCache
 from background_modes import AutoModeThread, auto_mode_logic, milking_mode_logic, edging_mode_logic
 <<<<<<< HEAD
 # INTEGRATION: Import the new ButtplugController.
 from buttplug_controller import ButtplugController
 =======
+from buttplug_controller import ButtplugController
 from script_library import ScriptLibrary
 >>>>>>> abb6cafeac2d32c73113cbded5fac77b851835a4
 
@@ -43,25 +48,46 @@ script_paths = [
     Path(__file__).with_name("static").joinpath("complete_script_library_with_meta.json"),
     Path("/mnt/data/complete_script_library_with_meta.json"),
 ]
-scripts = ScriptLibrary(script_paths)
+scripts = ScriptLibrary(script_paths, stats_path=Path(__file__).with_name("pattern_stats.jsonl"))
+
+# Device picked in /set_interface (Handy or Buttplug); modes play patterns on it, defaulting to `handy`
+device_controller = None
 >>>>>>> abb6cafeac2d32c73113cbded5fac77b851835a4
 llm = LLMService(url=LLM_URL)
 
-handy = HandyController(settings.handy_key, llm_service=llm) # <-- Pass LLM service here
+handy = HandyController(settings.handy_key, llm_service=llm, # <-- Pass LLM service here
+                        playback_mode=settings.handy_playback_mode)
 handy.update_settings(getattr(settings, "min_speed", 0),
                       getattr(settings, "max_speed", 100),
                       getattr(settings, "min_depth", 0),
                       getattr(settings, "max_depth", 100))
 
 audio = AudioService()
+audio.tts_cache = TTSCache(Path(__file__).with_name("tts_cache"))
+
+# Fixed lines spoken over and over; pre-rendered so they play instantly and cost no API quota
+TTS_WARMUP_PHRASES = [
+    "Okay, I'll take over.",
+    "Let's play an edging game...",
+    "You're so close... I'm taking over completely now.",
+    "Edging started.",
+    "Milking started.",
+    "Stopping.",
+    "That's it... give it all to me. Don't hold back.",
+    "Okay, you're in control now.",
+    *[f"You held {n} edge{'s' if n != 1 else ''}." for n in range(1, 6)],
+]
+
 if settings.elevenlabs_api_key:
     if audio.set_api_key(settings.elevenlabs_api_key):
         audio.fetch_available_voices()
         audio.configure_voice(settings.elevenlabs_voice_id, True)
+        threading.Thread(target=audio.warm_up, args=(TTS_WARMUP_PHRASES,), daemon=True).start()
 
 # --- IN-MEMORY STATE ---
 chat_history = deque(maxlen=50)
-messages_for_ui = deque()
+# Bounded so it can't grow forever when the UI listens on /events instead of polling
+messages_for_ui = deque(maxlen=100)
 auto_mode_active_task = None
 current_reply_length = settings.reply_length
 use_long_term_memory = True
@@ -71,8 +97,13 @@ mode_message_queue = deque(maxlen=5)
 edging_start_time = None
 special_persona_mode = None
 special_persona_interactions_left = 0
+current_mood = "Curious"  # last new_mood from the model or a mode; shown by /get_status and /events
 last_pattern_name = None
 
+# Profile consolidation runs in the background; replies read the last consolidated profile
+memory_consolidator = MemoryConsolidator(llm, chat_history, settings, enabled=lambda: use_long_term_memory)
+memory_consolidator.start()
+
 # Zone lock and stroke policy
 _zone_lock = {"zone": None, "expires_at": 0.0, "no_connectors": False}
 _allow_full_until = 0.0  # timestamp when "full strokes" permission expires
@@ -80,6 +111,13 @@ _allow_full_until = 0.0  # timestamp when "full strokes" permission expires
 # Telemetry
 move_telemetry = deque(maxlen=50)
 
+# Push channel for the UI (/events); the polling endpoints stay for older clients
+events = EventBus()
+audio.on_audio_ready = lambda clip: events.publish("audio_ready", {"id": clip.id, "queued": len(audio.audio_output_queue)})
+
+# TTS runs on a small fixed pool; clips are still queued in message order
+tts_pool = TTSWorkerPool(audio.generate_audio_for_text, audio.queue_clip, num_workers=2, max_backlog=4)
+
 # --- CONSTANTS ---
 SNAKE_ASCII = "<pre>...</pre>"
 DOOM_SLAYER_ASCII = r"""<pre>
@@ -298,11 +336,12 @@ def get_current_context(chat_history: deque = None):
 def add_message_to_queue(text, add_to_history=True):
     if not text: return
     messages_for_ui.append(text)
+    events.publish("chat", {"text": text})
     if add_to_history:
         clean_text = re.sub(r'<[^>]+>', '', text).strip()
         if clean_text:
             chat_history.append({"role": "assistant", "content": clean_text})
-    threading.Thread(target=audio.generate_audio_for_text, args=(text,)).start()
+    tts_pool.submit(text)
 
 def remember_pattern(name: str):
     global last_pattern_name
@@ -313,12 +352,40 @@ def log_move_telemetry(zone: str, dp: int, rng: int):
     span = max(1.0, hi - lo)
     move_telemetry.append((time.time(), zone or "", int(dp), int(rng), int(span)))
 
+def _active_device():
+    """The controller picked in /set_interface, or the Handy one when none was picked."""
+    return device_controller or handy
+
+def _set_mood(mood):
+    global current_mood
+    if mood:
+        current_mood = mood
+
+def _status_snapshot():
+    """The part of /get_status the UI redraws from; pushed on /events whenever it changes."""
+    zl = _get_zone_lock()
+    device = _active_device()
+    return {
+        "mood": current_mood,
+        "speed": device.last_stroke_speed,
+        "depth": device.last_depth_pos,
+        "last_rng": getattr(device, "last_stroke_range", 0),
+        "zone_lock": zl.get("zone"),
+        "full_allowed": _full_allowed(),
+    }
+
+def _mode_snapshot():
+    return {"active_mode": auto_mode_active_task.name if auto_mode_active_task else None}
+
+events.watch("status", _status_snapshot)
+events.watch("mode", _mode_snapshot)
+
 def get_policy_callbacks():
     return {
         'send_message': add_message_to_queue,
         'get_context': get_current_context,
         'on_stop': lambda: None,
-        'update_mood': lambda m: None,
+        'update_mood': _set_mood,
         'user_signal_event': user_signal_event,
         'message_queue': mode_message_queue,
         'get_timings': lambda n: {
@@ -379,7 +446,8 @@ def start_background_mode(mode_logic, initial_message, mode_name):
         handy.set_mode_context(None)
     callbacks = get_policy_callbacks()
     callbacks['on_stop'] = on_stop
-    services = {'llm': llm, 'handy': handy, 'scripts': scripts, 'chat_history': chat_history}
+    services = {'llm': llm, 'handy': handy, 'device': device_controller or handy,
+                'scripts': scripts, 'chat_history': chat_history}
 >>>>>>> abb6cafeac2d32c73113cbded5fac77b851835a4
     auto_mode_active_task = AutoModeThread(mode_logic, initial_message, services, callbacks, mode_name=mode_name)
     auto_mode_active_task.start()
@@ -556,7 +624,7 @@ def set_interface():
         device_controller = None
 
     if interface_type == 'handy':
-        device_controller = HandyController(settings.handy_key)
+        device_controller = HandyController(settings.handy_key, playback_mode=settings.handy_playback_mode)
         # Apply saved settings
         device_controller.update_settings(settings.min_speed, settings.max_speed, settings.min_depth, settings.max_depth)
         settings.device_interface = 'handy'
@@ -715,17 +783,7 @@ def handle_user_message():
 >>>>>>> abb6cafeac2d32c73113cbded5fac77b851835a4
 
     chat_history.append({"role": "user", "content": user_input})
-
-    # Consolidate memory immediately so response can use it
-    if use_long_term_memory:
-        try:
-            chunk = list(chat_history)[-12:]
-            new_profile = llm.consolidate_user_profile(chunk, settings.user_profile or {})
-            settings.user_profile = new_profile
-            # persist low-cost
-            settings.save()
-        except Exception as e:
-            print("Profile consolidation error:", e)
+    memory_consolidator.note_message()
 
     handled, response = _handle_chat_commands(user_input.lower())
     if handled: return response
@@ -745,7 +803,30 @@ def handle_user_message():
     
 =======
 
-    llm_response = llm.get_chat_response(list(chat_history), get_current_context(chat_history=chat_history))
+    started = {"chat": False, "move": False}
+    streamed = {}
+
+    def start_move(action_tag, modifiers):
+        # Use dynamic values from LLM, with fallbacks
+        sp = modifiers.get("speed", 45)
+        dp = modifiers.get("depth", 50)
+        rng = modifiers.get("range", 25) # Fallback to old value if missing
+
+        sp, dp, rng = enforce_move(sp, dp, rng, tag=action_tag)
+        handy.move(sp, dp, rng, context=get_current_context(chat_history=chat_history)) # <-- Pass context here
+        log_move_telemetry(action_tag, dp, rng)
+
+    def on_field(key, value):
+        # Speak and move as soon as each field is complete, not when the whole reply is done
+        streamed[key] = value
+        if key == "chat" and value and not started["chat"]:
+            started["chat"] = True
+            add_message_to_queue(value)
+        if not started["move"] and streamed.get("action_tag") and isinstance(streamed.get("modifiers"), dict):
+            started["move"] = True
+            start_move(streamed["action_tag"], streamed["modifiers"])
+
+    llm_response = llm.get_chat_response_stream(list(chat_history), get_current_context(chat_history=chat_history), on_field=on_field)
 
 >>>>>>> abb6cafeac2d32c73113cbded5fac77b851835a4
     if special_persona_mode is not None:
@@ -771,21 +852,14 @@ def handle_user_message():
             device_controller.move(move.get("sp"), move.get("dp"), move.get("rng"))
             
 =======
-    if (chat_text := llm_response.get("chat")): add_message_to_queue(chat_text)
-    if (new_mood := llm_response.get("new_mood")): pass
+    if (chat_text := llm_response.get("chat")) and not started["chat"]: add_message_to_queue(chat_text)
+    _set_mood(llm_response.get("new_mood"))
 
-    # Optional one-off move
+    # Optional one-off move, unless streaming already started it
     action_tag = llm_response.get("action_tag")
     modifiers = llm_response.get("modifiers")
-    if action_tag and isinstance(modifiers, dict):
-        # Use dynamic values from LLM, with fallbacks
-        sp = modifiers.get("speed", 45)
-        dp = modifiers.get("depth", 50)
-        rng = modifiers.get("range", 25) # Fallback to old value if missing
-
-        sp, dp, rng = enforce_move(sp, dp, rng, tag=action_tag)
-        handy.move(sp, dp, rng, context=get_current_context(chat_history=chat_history)) # <-- Pass context here
-        log_move_telemetry(action_tag, dp, rng)
+    if not started["move"] and action_tag and isinstance(modifiers, dict):
+        start_move(action_tag, modifiers)
 
 >>>>>>> abb6cafeac2d32c73113cbded5fac77b851835a4
     return jsonify({"status": "ok"})
@@ -833,6 +907,7 @@ def check_settings_route():
             "elevenlabs_key": settings.elevenlabs_api_key,
             "pfp": settings.get_profile_picture_url(),
             "reply_length": settings.reply_length,
+            "playback_mode": settings.handy_playback_mode,
             "timings": {
                 "auto_min": settings.auto_min_time, "auto_max": settings.auto_max_time,
                 "milking_min": settings.milking_min_time, "milking_max": settings.milking_max_time,
@@ -879,6 +954,18 @@ def set_reply_length_route():
         return jsonify({"status": "success", "length": length})
     return jsonify({"status": "error", "message": "Invalid length"}), 400
 
+@app.route('/set_playback_mode', methods=['POST'])
+def set_playback_mode_route():
+    mode = request.json.get('mode')
+    if mode not in ('hdsp', 'hssp'):
+        return jsonify({"status": "error", "message": "Invalid playback mode"}), 400
+    settings.handy_playback_mode = mode
+    handy.set_playback_mode(mode)
+    if isinstance(device_controller, HandyController) and device_controller is not handy:
+        device_controller.set_playback_mode(mode)
+    settings.save()
+    return jsonify({"status": "success", "mode": mode})
+
 @app.route('/set_ai_name', methods=['POST'])
 def set_ai_name_route():
     global special_persona_mode, special_persona_interactions_left
@@ -956,10 +1043,50 @@ def set_elevenlabs_voice_route():
 @app.route('/get_updates')
 def get_ui_updates_route():
     messages = [messages_for_ui.popleft() for _ in range(len(messages_for_ui))]
-    if audio_chunk := audio.get_next_audio_chunk():
-        return send_file(io.BytesIO(audio_chunk), mimetype='audio/mpeg')
+    if clip := audio.get_next_audio_clip():
+        # Streamed: bytes go out as they are synthesized
+        return Response(clip.iter_chunks(), mimetype='audio/mpeg')
     return jsonify({"messages": messages})
 
+@app.route('/events')
+def events_route():
+    """Server-Sent Events: chat, audio_ready, status and mode pushed as they happen."""
+    sub = events.subscribe()
+
+    def stream():
+        try:
+            yield format_sse("status", _status_snapshot())
+            yield format_sse("mode", _mode_snapshot())
+            while not sub.closed:
+                batch = sub.get(timeout=15)
+                if not batch:
+                    # Comment frame keeps proxies and the browser from timing the stream out
+                    yield ": keepalive\n\n"
+                    continue
+                for event, data in batch:
+                    yield format_sse(event, data)
+        finally:
+            events.unsubscribe(sub)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/audio/<int:clip_id>')
+def audio_clip_route(clip_id):
+    """
+    One clip by the id in its audio_ready event. Idempotent: browsers re-request (probe, Range) the clip
+    they are playing. A plain GET of a clip still being synthesized streams it as it arrives; ranges and
+    finished clips are served whole, with Content-Length and Range support.
+    """
+    clip = audio.get_clip(clip_id)
+    if clip is None:
+        return ('', 404)
+    range_header = request.headers.get('Range')
+    if not clip.done and range_header in (None, 'bytes=0-'):
+        return Response(clip.iter_chunks(), mimetype='audio/mpeg')
+    data = clip.read_all()
+    return Response(data, mimetype='audio/mpeg').make_conditional(request, accept_ranges=True, complete_length=len(data))
+
 @app.route('/set_timings', methods=['POST'])
 def set_timings_route():
     data = request.json or {}
@@ -1030,18 +1157,25 @@ def like_last_move_route():
     return jsonify({"status": "boosted", "name": pattern_name})
 =======
     active_mode = auto_mode_active_task.name if auto_mode_active_task else None
-    last_dp = handy.last_depth_pos
-    last_rng = getattr(handy, "last_stroke_range", 0)
+    device = _active_device()
+    last_dp = device.last_depth_pos
+    last_rng = getattr(device, "last_stroke_range", 0)
     zl = _get_zone_lock()
     return jsonify({
-        "mood": "Curious",
-        "speed": handy.last_stroke_speed,
+        "mood": current_mood,
+        "speed": device.last_stroke_speed,
         "depth": last_dp,
         "active_mode": active_mode,
         "zone_lock": zl.get("zone"),
         "zone_lock_no_connectors": zl.get("no_connectors"),
         "full_allowed": _full_allowed(),
         "last_rng": last_rng,
+        "link": handy.get_link_stats(),
+        "memory": memory_consolidator.stats(),
+        "audio": audio.stats(),
+        "tts": tts_pool.stats(),
+        "pattern_stats": scripts.stats_store.stats() if scripts.stats_store else None,
+        "settings_saver": settings.save_stats(),
     })
 
 @app.route('/stop_everything', methods=['POST', 'GET'])
@@ -1097,15 +1231,13 @@ if __name__ == '__main__':
 # --- APP SHUTDOWN ---
 def on_exit():
     print("Saving settings on exit...")
-    # Try to consolidate one last time using the last 12 messages
-    try:
-        chunk = list(chat_history)[-12:]
-        if use_long_term_memory:
-            new_profile = llm.consolidate_user_profile(chunk, settings.user_profile or {})
-            settings.user_profile = new_profile
-    except Exception:
-        pass
+    # Let a consolidation already running finish, then do whatever the worker hasn't picked up yet
+    memory_consolidator.stop()
+    memory_consolidator.join(timeout=30.0)
+    memory_consolidator.flush()
+    scripts.close()
     settings.save()
+    settings.flush()
 
 if __name__ == '__main__':
     atexit.register(on_exit)
@@ -1,6 +1,101 @@
-from collections import deque
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict, deque
 from elevenlabs.client import ElevenLabs
 from elevenlabs import Voice, VoiceSettings
+from tts_cache import cache_key
+
+TTS_MODEL_ID = "eleven_multilingual_v2"
+TTS_VOICE_SETTINGS = {"stability": 0.4, "similarity_boost": 0.7, "style": 0.1, "use_speaker_boost": True}
+
+# Sentences shorter than this are merged into the next one; tiny clips sound choppy and cost a request each
+MIN_SENTENCE_CHARS = 24
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+# A period after one of these (or after a single-letter initial) doesn't end the sentence
+_ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e", "a.m", "p.m"}
+# Finished clips kept addressable by id, so the browser can re-request (Range/probe) one it is playing
+RETAINED_CLIPS = 32
+
+def _sentence_parts(text):
+    parts, start = [], 0
+    for m in _SENTENCE_END.finditer(text):
+        before = text[start:m.start()]
+        if before.endswith("."):
+            word = before.rsplit(None, 1)[-1].rstrip(".").lower()
+            if word in _ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+                continue
+        parts.append(before)
+        start = m.end()
+    parts.append(text[start:])
+    return parts
+
+def split_sentences(text, min_chars=MIN_SENTENCE_CHARS):
+    """Split text into sentence-sized pieces for synthesis, merging fragments that are too short."""
+    pieces = []
+    buf = ""
+    for part in _sentence_parts((text or "").strip()):
+        buf = f"{buf} {part}".strip() if buf else part.strip()
+        if len(buf) >= min_chars:
+            pieces.append(buf)
+            buf = ""
+    if buf:
+        if pieces and len(buf) < min_chars:
+            pieces[-1] = f"{pieces[-1]} {buf}"
+        else:
+            pieces.append(buf)
+    return pieces
+
+class AudioClip:
+    """
+    One sentence of speech, readable while it is still being synthesized.
+    The producer calls add()/finish(); consumers iterate iter_chunks(), which yields bytes as they arrive.
+    Any number of readers may iterate the same clip.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, text=""):
+        self.id = next(AudioClip._ids)
+        self.text = text
+        self._chunks = []
+        self._cond = threading.Condition()
+        self.done = False
+        self.error = None
+        self.on_first_chunk = None
+
+    def add(self, chunk):
+        if not chunk:
+            return
+        with self._cond:
+            first = not self._chunks
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+        if first and self.on_first_chunk:
+            self.on_first_chunk()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def iter_chunks(self, timeout=30.0):
+        i = 0
+        while True:
+            with self._cond:
+                if i >= len(self._chunks) and not self.done:
+                    self._cond.wait(timeout)
+                if i >= len(self._chunks):
+                    # Finished, or the producer stalled past the timeout
+                    return
+                chunk = self._chunks[i]
+            i += 1
+            yield chunk
+
+    def read_all(self):
+        """Block until synthesis is finished and return the whole clip."""
+        return b"".join(self.iter_chunks())
 
 class AudioService:
     def __init__(self):
@@ -9,7 +104,16 @@ class AudioService:
         self.is_on = False
         self.client = None
         self.available_voices = {}
-        self.audio_output_queue = deque()
+        self.audio_output_queue = deque(maxlen=RETAINED_CLIPS)  # for clients that pop clips by polling
+        self._clips = OrderedDict()  # id -> AudioClip, the most recent RETAINED_CLIPS
+        self._clips_lock = threading.Lock()
+        self.on_audio_ready = None  # optional callback(clip), fired after a clip is queued
+        self.tts_cache = None  # optional TTSCache; repeated lines are served from disk
+
+        # Time from a generate request to its first synthesized bytes
+        self._ttfa_count = 0
+        self._ttfa_total_ms = 0.0
+        self.ttfa_last_ms = 0.0
 
     def set_api_key(self, api_key):
         self.api_key = api_key
@@ -49,31 +153,111 @@ class AudioService:
         return True, "Settings updated."
 
 
-    def generate_audio_for_text(self, text_to_speak):
+    def queue_clip(self, clip):
+        with self._clips_lock:
+            self._clips[clip.id] = clip
+            while len(self._clips) > RETAINED_CLIPS:
+                self._clips.popitem(last=False)
+        self.audio_output_queue.append(clip)
+        if self.on_audio_ready:
+            self.on_audio_ready(clip)
+
+    def get_clip(self, clip_id):
+        """A recently queued clip by id (repeat requests get the same clip), or None."""
+        with self._clips_lock:
+            return self._clips.get(clip_id)
+
+    def _can_speak(self, text):
         if not self.is_on or not self.api_key or not self.voice_id or not self.client:
+            return False
+        return bool(text) and not text.strip().startswith(("(", "["))
+
+    def _synthesize(self, sentence, clip):
+        """Fill clip with audio for one sentence, from the cache when possible."""
+        key = cache_key(self.voice_id, TTS_MODEL_ID, TTS_VOICE_SETTINGS, sentence) if self.tts_cache else None
+        if key and (cached := self.tts_cache.get(key)) is not None:
+            clip.add(cached)
+            clip.finish()
             return
-            
-        if not text_to_speak or text_to_speak.strip().startswith(("(", "[")):
+        audio_stream = self.client.text_to_speech.convert(
+            voice_id=self.voice_id,
+            text=sentence,
+            model_id=TTS_MODEL_ID,
+            voice_settings=VoiceSettings(**TTS_VOICE_SETTINGS)
+        )
+        chunks = []
+        for chunk in audio_stream:
+            chunks.append(chunk)
+            clip.add(chunk)
+        clip.finish()
+        if key:
+            self.tts_cache.put(key, b"".join(chunks))
+
+    def warm_up(self, phrases):
+        """Pre-render fixed phrases into the cache (call from a background thread)."""
+        if not self.tts_cache:
+            return 0
+        rendered = 0
+        for phrase in phrases:
+            if not self._can_speak(phrase):
+                continue
+            for sentence in split_sentences(phrase):
+                if cache_key(self.voice_id, TTS_MODEL_ID, TTS_VOICE_SETTINGS, sentence) in self.tts_cache:
+                    continue
+                try:
+                    self._synthesize(sentence, AudioClip(sentence))
+                    rendered += 1
+                except Exception as e:
+                    print(f"🔥 TTS warm-up failed for '{sentence[:30]}': {e}")
+                    return rendered
+        if rendered:
+            print(f"✅ Pre-rendered {rendered} fixed phrase(s).")
+        return rendered
+
+    def generate_audio_for_text(self, text_to_speak, emit=None):
+        """Synthesize text sentence by sentence. Each clip goes to emit (default: queue_clip) before it is filled."""
+        emit = emit or self.queue_clip
+        if not self._can_speak(text_to_speak):
             return
 
-        try:
-            print(f"🎙️ Generating audio: '{text_to_speak[:50]}...'")
-            
-            audio_stream = self.client.text_to_speech.convert(
-                voice_id=self.voice_id,
-                text=text_to_speak,
-                model_id="eleven_multilingual_v2",
-                voice_settings=VoiceSettings(stability=0.4, similarity_boost=0.7, style=0.1, use_speaker_boost=True)
-            )
+        print(f"🎙️ Generating audio: '{text_to_speak[:50]}...'")
+        started = time.monotonic()
+        # One clip per sentence: the first sentence can play while the rest are still being synthesized
+        for i, sentence in enumerate(split_sentences(text_to_speak)):
+            clip = AudioClip(sentence)
+            emit(clip)
+            try:
+                if i == 0:
+                    clip.on_first_chunk = lambda: self._record_ttfa((time.monotonic() - started) * 1000.0)
+                self._synthesize(sentence, clip)
+            except Exception as e:
+                clip.finish(error=e)
+                print(f"🔥 Oops, ElevenLabs problem: {e}")
+                return
+        print("✅ Audio ready.")
 
-            audio_bytes_data = b"".join(audio_stream)
-            self.audio_output_queue.append(audio_bytes_data)
-            print("✅ Audio ready.")
+    def _record_ttfa(self, ms):
+        self._ttfa_count += 1
+        self._ttfa_total_ms += ms
+        self.ttfa_last_ms = ms
+        print(f"🔊 First audio after {ms:.0f} ms")
 
-        except Exception as e:
-            print(f"🔥 Oops, ElevenLabs problem: {e}")
-            
-    def get_next_audio_chunk(self):
+    def stats(self):
+        return {
+            "queued_clips": len(self.audio_output_queue),
+            "cache": self.tts_cache.stats() if self.tts_cache else None,
+            "ttfa_last_ms": round(self.ttfa_last_ms, 1),
+            "ttfa_avg_ms": round(self._ttfa_total_ms / self._ttfa_count, 1) if self._ttfa_count else 0.0,
+            "ttfa_samples": self._ttfa_count,
+        }
+
+    def get_next_audio_clip(self):
+        """Next queued AudioClip (possibly still streaming), or None."""
         if self.audio_output_queue:
             return self.audio_output_queue.popleft()
-        return None
\ No newline at end of file
+        return None
+
+    def get_next_audio_chunk(self):
+        """Next clip as complete bytes; waits for it to finish synthesizing."""
+        clip = self.get_next_audio_clip()
+        return clip.read_all() if clip else None
\ No newline at end of file
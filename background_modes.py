@@ -3,15 +3,20 @@ import threading
 import time
 import random
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
-def _drain_latest_message(message_queue):
-    try:
-        latest = None
-        while True:
-            latest = message_queue.popleft()
-    except IndexError:
-        pass
-    return latest
+def _peek_latest_message(message_queue):
+    """(latest queued message or None, how many are queued); nothing is consumed."""
+    count = len(message_queue)
+    return (message_queue[count - 1] if count else None), count
+
+def _consume_messages(message_queue, count):
+    """Drop the `count` oldest messages (the ones a committed plan has answered)."""
+    for _ in range(count):
+        try:
+            message_queue.popleft()
+        except IndexError:
+            return
 
 class AutoModeThread(threading.Thread):
     def __init__(self, mode_func, initial_message, services, callbacks, mode_name="auto"):
@@ -75,6 +80,10 @@ class AutoModeThread(threading.Thread):
                     pass
 
 # ---- Pattern playback helpers ----
+def _device(services):
+    """The selected device controller (Handy or Buttplug; both take play_pattern steps), else the Handy."""
+    return services.get('device') or services['handy']
+
 def _choose_zone(default_choices, callbacks):
     """Apply zone lock and full permission to pick a zone."""
     zl = callbacks.get('get_zone_lock', lambda: {"zone": None, "no_connectors": False})()
@@ -86,13 +95,12 @@ def _choose_zone(default_choices, callbacks):
     weights = [0.40, 0.30, 0.30] + ([0.10] if full_ok else [])
     return random.choices(zones, weights=weights, k=1)[0], False
 
-def _play_pattern(stop_event, services, callbacks, zone, duration_s, preferred_tags=None, rng_cap_frac_override=None, recent_names=None, recent_classes=None):
+def _prepare_pattern(services, callbacks, zone, duration_s, preferred_tags=None, rng_cap_frac_override=None, recent_names=None, recent_classes=None):
     """
-    Selects, scales, and plays a library pattern for a given duration.
+    Selects and scales a library pattern without touching the device or any state.
+    Returns {'name', 'class', 'zone', 'steps', 'duration_s'}.
     """
     scripts = services['scripts']
-    handy = services['handy']
-    remember = callbacks.get('remember_pattern')
     
     ctx = callbacks['get_context']()
     lo = ctx.get('allowed_depth_min', 0)
@@ -110,25 +118,128 @@ def _play_pattern(stop_event, services, callbacks, zone, duration_s, preferred_t
         preferred_tags=preferred_tags
     )
 
-    if remember and pat and pat.get('name'):
-        remember(pat['name'])
-
     seed = hash((pat.get('name') if pat else "fallback", int(time.time() // 5))) & 0xFFFFFFFF
     steps = scripts.scale_to_user(
         pat, zone, lo, hi, duration_s,
         jitter_dp_frac=0.02, jitter_rng_frac=0.10, rng_cap_frac_override=rng_cap_frac_override, seed=seed
     )
 
-    if steps:
-        handy.play_pattern(steps)
-        # Wait for the pattern to finish, while still being responsive to a stop signal
-        end_time = time.time() + duration_s
-        while time.time() < end_time and not stop_event.is_set():
-            time.sleep(0.1)
+    return {
+        'name': pat.get('name') if pat else None,
+        'class': pat.get('class') if pat else None,
+        'zone': zone,
+        'steps': steps,
+        'duration_s': duration_s,
+    }
+
+def _remember_pattern(callbacks, pattern, recent_names=None, recent_classes=None):
+    """Record a pattern that is actually being played (last pattern for likes, recent lists)."""
+    remember = callbacks.get('remember_pattern')
+    if remember and pattern['name']:
+        remember(pattern['name'])
+    if recent_names is not None and pattern['name']:
+        recent_names.append(pattern['name'])
+    if recent_classes is not None and pattern['class']:
+        recent_classes.append(pattern['class'])
+
+def _wait_until(stop_event, deadline):
+    """Wait for a monotonic deadline, while still being responsive to a stop signal."""
+    while not stop_event.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        stop_event.wait(min(0.1, remaining))
+
+def _play_pattern(stop_event, services, callbacks, zone, duration_s, preferred_tags=None, rng_cap_frac_override=None, recent_names=None, recent_classes=None):
+    """
+    Selects, scales, and plays a library pattern for a given duration.
+    """
+    prepared = _prepare_pattern(services, callbacks, zone, duration_s, preferred_tags=preferred_tags,
+                                rng_cap_frac_override=rng_cap_frac_override,
+                                recent_names=recent_names, recent_classes=recent_classes)
+    _remember_pattern(callbacks, prepared)
+    if prepared['steps']:
+        _device(services).play_pattern(prepared['steps'])
+        _wait_until(stop_event, time.monotonic() + duration_s)
+    return prepared['name'], prepared['class'], zone, False
+
+# ---- Pipelined mode loop ----
+def _plan_safely(plan_cycle):
+    try:
+        return plan_cycle()
+    except Exception as e:
+        print(f"Mode cycle planning failed: {e}")
+        return None
+
+def _await_cycle(future, stop_event):
+    while not stop_event.is_set():
+        try:
+            return future.result(timeout=0.1)
+        except FutureTimeout:
+            continue
+        except Exception as e:
+            print(f"Mode cycle planning failed: {e}")
+            return None
+    return None
+
+def _run_pipelined(stop_event, services, callbacks, plan_cycle, inputs=None):
+    """
+    Plays mode cycles back to back. plan_cycle() does the slow part of a cycle (the LLM line plus
+    pattern select/scale) and returns {'chat', 'pattern', 'commit'}; the next cycle is planned on a
+    worker while the current pattern plays, so the device doesn't idle while the model is thinking.
+    Planning has no side effects: commit() (consume the user's message, advance phase and history)
+    runs on this thread only when the cycle is played, so a discarded plan, or one still running
+    after stop, changes nothing. inputs() snapshots what a plan reads (queued messages, the edge
+    signal); when it changes, the upcoming cycle is re-planned right away rather than at the boundary.
+    """
+    device = _device(services)
+    send_message = callbacks['send_message']
+    snapshot = inputs or (lambda: None)
+    # Two workers, so a re-plan starts while the stale plan's LLM call is still finishing
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ModePrefetch")
+
+    def submit():
+        seen = snapshot()
+        return pool.submit(_plan_safely, plan_cycle), seen
 
-    if pat:
-        return pat.get('name'), pat.get('class'), zone, False
-    return None, None, zone, False
+    try:
+        upcoming, seen = submit()
+        while not stop_event.is_set():
+            cycle = _await_cycle(upcoming, stop_event)
+            if stop_event.is_set():
+                break
+            if cycle is None:
+                stop_event.wait(1.0)
+                upcoming, seen = submit()
+                continue
+            if snapshot() != seen:
+                # Input arrived while waiting on this plan; the current pattern keeps looping meanwhile
+                upcoming, seen = submit()
+                continue
+
+            if cycle.get('commit'):
+                cycle['commit']()
+            if cycle.get('chat'):
+                send_message(cycle['chat'])
+            pattern = cycle['pattern']
+            if pattern['steps']:
+                device.play_pattern(pattern['steps'])
+            deadline = time.monotonic() + pattern['duration_s']
+
+            # Plan the next cycle while this one plays; history already includes the line just sent
+            upcoming, seen = submit()
+            while not stop_event.is_set() and (remaining := deadline - time.monotonic()) > 0:
+                stop_event.wait(min(0.1, remaining))
+                if snapshot() != seen:
+                    upcoming.cancel()
+                    upcoming, seen = submit()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _chat_line(resp):
+    if isinstance(resp, dict) and resp.get('chat'):
+        return resp['chat']
+    return None
 
 def auto_mode_logic(stop_event, services, callbacks):
 <<<<<<< HEAD
@@ -165,7 +276,6 @@ def milking_mode_logic(stop_event, services, callbacks):
 =======
     llm = services['llm']
     get_context = callbacks['get_context']
-    send_message = callbacks['send_message']
     get_timings = callbacks['get_timings']
     messages = callbacks['message_queue']
     chat_history = services['chat_history']
@@ -174,12 +284,12 @@ def milking_mode_logic(stop_event, services, callbacks):
     recent_classes = deque(maxlen=3)
     recent_zones = deque(maxlen=2)
 
-    while not stop_event.is_set():
+    def plan_cycle():
         auto_min, auto_max = get_timings('auto')
         duration = max(0.5, random.uniform(float(auto_min), float(auto_max)))
 
         context = get_context(chat_history=chat_history)
-        user_msg = _drain_latest_message(messages)
+        user_msg, seen_msgs = _peek_latest_message(messages)
         
         current_history = list(chat_history)
         prompt_addition = "Speak one concise teasing line for automatic play. No numbers."
@@ -188,8 +298,6 @@ def milking_mode_logic(stop_event, services, callbacks):
         current_history.append({"role": "user", "content": prompt_addition})
         
         resp = llm.get_chat_response(current_history, context, temperature=0.9)
-        if isinstance(resp, dict) and resp.get('chat'):
-            send_message(resp['chat'])
 
         zone, no_connectors = _choose_zone(['mid', 'tip', 'base'], callbacks)
 
@@ -199,19 +307,23 @@ def milking_mode_logic(stop_event, services, callbacks):
             'base': ['zone-base']
         }.get(zone, [])
         
-        name, klass, z, nc = _play_pattern(
-            stop_event, services, callbacks, zone=zone, duration_s=duration,
+        pattern = _prepare_pattern(
+            services, callbacks, zone=zone, duration_s=duration,
             preferred_tags=local_tags,
             recent_names=list(recent_names), recent_classes=list(recent_classes)
         )
-        if name: recent_names.append(name)
-        if klass: recent_classes.append(klass)
-        recent_zones.append(z)
+
+        def commit():
+            _consume_messages(messages, seen_msgs)
+            _remember_pattern(callbacks, pattern, recent_names, recent_classes)
+            recent_zones.append(zone)
+        return {'chat': _chat_line(resp), 'pattern': pattern, 'commit': commit}
+
+    _run_pipelined(stop_event, services, callbacks, plan_cycle, inputs=lambda: len(messages))
 
 def milking_mode_logic(stop_event, services, callbacks):
     llm = services['llm']
     get_context = callbacks['get_context']
-    send_message = callbacks['send_message']
     get_timings = callbacks['get_timings']
     messages = callbacks['message_queue']
     chat_history = services['chat_history']
@@ -220,20 +332,20 @@ def milking_mode_logic(stop_event, services, callbacks):
     recent_names = deque(maxlen=6)
     recent_classes = deque(maxlen=3)
 
-    while not stop_event.is_set():
+    def plan_cycle():
         milking_min, milking_max = get_timings('milking')
         duration = max(0.3, random.uniform(float(milking_min), float(milking_max)))
 
         context = get_context(chat_history=chat_history)
         context['current_mood'] = 'Dominant'
-        user_msg = _drain_latest_message(messages)
+        user_msg, seen_msgs = _peek_latest_message(messages)
 
         current_history = list(chat_history)
         prompt_addition = "Short commanding line for a deep/base milking sequence."
         if user_msg:
             prompt_addition += f" Consider the user's last message: '{user_msg}'."
         current_history.append({"role": "user", "content": prompt_addition})
-        
+
 <<<<<<< HEAD
         if response.get("chat"): send_message(response.get("chat"))
         if move_data := response.get("move"):
@@ -251,16 +363,19 @@ def edging_mode_logic(stop_event, services, callbacks):
     get_context, send_message, get_timings, update_mood = callbacks['get_context'], callbacks['send_message'], callbacks['get_timings'], callbacks['update_mood']
 =======
         resp = llm.get_chat_response(current_history, context, temperature=0.8)
-        if isinstance(resp, dict) and resp.get('chat'):
-            send_message(resp['chat'])
 
-        name, klass, z, nc = _play_pattern(
-            stop_event, services, callbacks, zone='base', duration_s=duration,
+        pattern = _prepare_pattern(
+            services, callbacks, zone='base', duration_s=duration,
             preferred_tags=['zone-base', 'rhythm-pulse', 'rhythm-grind'],
             recent_names=list(recent_names), recent_classes=list(recent_classes)
         )
-        if name: recent_names.append(name)
-        if klass: recent_classes.append(klass)
+
+        def commit():
+            _consume_messages(messages, seen_msgs)
+            _remember_pattern(callbacks, pattern, recent_names, recent_classes)
+        return {'chat': _chat_line(resp), 'pattern': pattern, 'commit': commit}
+
+    _run_pipelined(stop_event, services, callbacks, plan_cycle, inputs=lambda: len(messages))
 
 def edging_mode_logic(stop_event, services, callbacks):
     llm = services['llm']
@@ -278,17 +393,16 @@ def edging_mode_logic(stop_event, services, callbacks):
     recent_names = deque(maxlen=6)
     recent_classes = deque(maxlen=3)
 
-    while not stop_event.is_set():
+    def plan_cycle():
         edging_min, edging_max = get_timings('edging')
         duration = max(0.5, random.uniform(float(edging_min), float(edging_max)))
 
         context = get_context(chat_history=chat_history)
         context['current_mood'] = 'Teasing'
-        user_msg = _drain_latest_message(messages)
-        if user_signal_event.is_set():
-            user_signal_event.clear()
-            phase = 'PULL_BACK'
-            edges += 1
+        user_msg, seen_msgs = _peek_latest_message(messages)
+        signalled = user_signal_event.is_set()
+        # This plan's phase; phase itself only advances when the plan is committed
+        cycle_phase = 'PULL_BACK' if signalled else phase
         
 <<<<<<< HEAD
         if chat_text := response.get("chat"): send_message(chat_text)
@@ -297,31 +411,37 @@ def edging_mode_logic(stop_event, services, callbacks):
             device_controller.move(move_data.get("sp"), move_data.get("dp"), move_data.get("rng"))
 =======
         current_history = list(chat_history)
-        prompt_addition = f"Edging phase: {phase}. One sentence."
+        prompt_addition = f"Edging phase: {cycle_phase}. One sentence."
         if user_msg:
             prompt_addition += f" Consider the user's last message: '{user_msg}'."
         current_history.append({"role": "user", "content": prompt_addition})
 >>>>>>> abb6cafeac2d32c73113cbded5fac77b851835a4
 
         resp = llm.get_chat_response(current_history, context, temperature=0.8)
-        if isinstance(resp, dict) and resp.get('chat'):
-            send_message(resp['chat'])
 
         zone_map = {'BUILD_UP': 'mid', 'TEASE': 'tip', 'PULL_BACK': 'base', 'RECOVERY': 'mid'}
-        zone = zone_map.get(phase, 'mid')
+        zone = zone_map.get(cycle_phase, 'mid')
 
-        name, klass, z, nc = _play_pattern(
-            stop_event, services, callbacks, zone=zone, duration_s=duration,
+        pattern = _prepare_pattern(
+            services, callbacks, zone=zone, duration_s=duration,
             preferred_tags=None,
             recent_names=list(recent_names), recent_classes=list(recent_classes)
         )
-        if name: recent_names.append(name)
-        if klass: recent_classes.append(klass)
-
-        if phase == 'PULL_BACK':
-            phase = 'RECOVERY'
-        else:
-            phase = random.choice(['BUILD_UP', 'TEASE'])
+        next_phase = 'RECOVERY' if cycle_phase == 'PULL_BACK' else random.choice(['BUILD_UP', 'TEASE'])
+
+        def commit():
+            nonlocal phase, edges
+            _consume_messages(messages, seen_msgs)
+            if signalled:
+                user_signal_event.clear()
+                edges += 1
+            phase = next_phase
+            _remember_pattern(callbacks, pattern, recent_names, recent_classes)
+        return {'chat': _chat_line(resp), 'pattern': pattern, 'commit': commit}
+
+    # An edge signal re-plans immediately, so the pull-back starts at the next boundary, not one cycle late
+    _run_pipelined(stop_event, services, callbacks, plan_cycle,
+                   inputs=lambda: (len(messages), user_signal_event.is_set()))
 
     try:
         if edges > 0:
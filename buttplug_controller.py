@@ -2,6 +2,7 @@
 import asyncio
 import threading
 import time
+from functools import partial
 from typing import Optional, Dict, Any
 
 try:
@@ -22,6 +23,14 @@ except ImportError as e:
         "Try: pip install buttplug-py"
     ) from e
 
+from buttplug.messages import v3
+
+from buttplug_dispatch import send_linear, send_rotate, send_scalar
+from buttplug_rate_limit import DeviceRateLimiter
+from buttplug_script_player import ButtplugScriptPlayer
+from buttplug_timing import CommandTiming
+from compiled_script import steps_to_script
+
 class ButtplugController:
     def __init__(self, server_uri: str = "ws://127.0.0.1:12345"):
         """Initialize the Buttplug controller.
@@ -61,8 +70,15 @@ class ButtplugController:
         )
         self.thread.start()
         
-        # Start the continuous movement loop
+        # Round-trip / stroke-period tracking shared by the movement loop and the script player
+        self.timing = CommandTiming()
+        # Per-device token bucket (from its message timing gap), set when a device is selected
+        self.rate_limiter = None
+
+        # Start the continuous movement loop, and the script player that replaces it while a script plays
         self._start_movement_loop()
+        self.script_player = ButtplugScriptPlayer(self)
+        asyncio.run_coroutine_threadsafe(self.script_player.run(), self.loop)
         
         print("Buttplug Controller initialized. Waiting for connection...")
 
@@ -78,6 +94,7 @@ class ButtplugController:
             pos1 = 0.25  # Default positions
             pos2 = 0.75
             current_pos = pos1
+            next_stroke_at = None  # monotonic time the next linear stroke is due on the device
             
             while not self._shutting_down:
                 try:
@@ -102,30 +119,39 @@ class ButtplugController:
                             
                         current_pos = next_pos
                         
-                        # Execute movement on all linear actuators
+                        # Execute movement on all linear actuators: one LinearCmd for the whole device.
+                        # Strokes are due back to back on a monotonic schedule; each is sent half a
+                        # measured round trip early and the ack is not awaited, so strokes stay continuous.
                         if self._linear_actuators:
-                            for actuator in self._linear_actuators:
-                                await actuator.command(duration_ms, current_pos)
-                            await asyncio.sleep(duration_ms / 1000.0)
+                            now = time.monotonic()
+                            if next_stroke_at is None or now - next_stroke_at > 1.0:
+                                next_stroke_at = now + self.timing.lead_s
+                                self.timing.reset_period()
+                            delay = next_stroke_at - self.timing.lead_s - now
+                            if delay > 0:
+                                await asyncio.sleep(delay)
+                            self._submit_command("linear", partial(send_linear, self.device, self._linear_actuators,
+                                                                   duration_ms, current_pos), duration_ms / 1000.0)
+                            next_stroke_at += duration_ms / 1000.0
                             
                         # For vibrator actuators, just maintain continuous vibration
                         elif self._vibrator_actuators:
                             level = min(1.0, max(0.0, self._target_speed / 100.0))
-                            for actuator in self._vibrator_actuators:
-                                await actuator.command(level)
+                            self._submit_command("scalar", partial(send_scalar, self.device, self._vibrator_actuators, level))
                             await asyncio.sleep(0.1)  # Small delay for continuous vibration
                             
                         # For rotatory actuators, just maintain continuous rotation
                         elif self._rotatory_actuators:
                             speed_level = min(1.0, max(0.0, self._target_speed / 100.0))
-                            for actuator in self._rotatory_actuators:
-                                await actuator.command(speed_level, True)  # clockwise
+                            self._submit_command("rotate", partial(send_rotate, self.device, self._rotatory_actuators,
+                                                                   speed_level, True))  # clockwise
                             await asyncio.sleep(0.1)  # Small delay for continuous rotation
                         else:
                             # No compatible actuators, small delay to prevent busy loop
                             await asyncio.sleep(0.1)
                     else:
                         # Not moving, small delay to prevent busy loop
+                        next_stroke_at = None
                         await asyncio.sleep(0.1)
                         
                 except Exception as e:
@@ -135,6 +161,13 @@ class ButtplugController:
         # Start the movement loop
         asyncio.run_coroutine_threadsafe(movement_loop(), self.loop)
 
+    def _submit_command(self, kind, factory, period_s=None):
+        """Send through the device's rate limiter (coalescing to the newest target); event loop only."""
+        if self.rate_limiter is None:
+            self.timing.dispatch(factory(), period_s=period_s)
+        else:
+            self.rate_limiter.submit(kind, factory, period_s)
+
     async def _connect_and_scan(self):
         """The core async connection and scanning logic."""
         try:
@@ -173,6 +206,17 @@ class ButtplugController:
             print(f"Error in connection/scanning: {error_msg}")
             self._connected = False
     
+    async def _message_timing_gap_ms(self, device):
+        """The device's DeviceMessageTimingGap from the server's device list, or None if it gives none."""
+        try:
+            device_list = await self.client.send(v3.RequestDeviceList())
+            for info in device_list.devices:
+                if info.device_index == device.index:
+                    return info.device_message_timing_gap
+        except Exception as e:
+            print(f"Couldn't read the message timing gap for {device.name}: {e}")
+        return None
+
     async def _try_use_device(self, device) -> bool:
         """Try to use a device if it's compatible.
         
@@ -229,8 +273,10 @@ class ButtplugController:
             
             # Check if we found any compatible actuators
             if self._vibrator_actuators or self._linear_actuators or self._rotatory_actuators:
+                gap_ms = await self._message_timing_gap_ms(device)
                 with self._lock:
                     self.device = device
+                    self.rate_limiter = DeviceRateLimiter.for_gap_ms(gap_ms, self.timing)
                     self.last_relative_speed = 0
                     self.last_stroke_speed = 0
                     self.last_depth_pos = 50
@@ -327,6 +373,7 @@ class ButtplugController:
             self.last_depth_pos = depth
 
         # Update target parameters for continuous movement
+        self.script_player.set_script(None)
         self._target_speed = speed
         self._target_depth = depth
         self._target_range = stroke_range
@@ -339,6 +386,27 @@ class ButtplugController:
             # Stop the device
             self.stop()
 
+    def play_script(self, script, loop=True):
+        """Play a player script dict or CompiledScript (the same ones ScriptPlayer takes)."""
+        if not self.is_connected or not self.device:
+            print("Cannot play script: No device connected")
+            return
+        self._movement_active = False
+        self.script_player.set_script(script, loop=loop)
+
+    def play_pattern(self, steps: list):
+        """Plays a pre-made pattern from the script library (same steps as HandyController.play_pattern)."""
+        script = steps_to_script(steps)
+        if script:
+            self.play_script(script)
+            # We don't have fine-grained speed control here, so we set an average
+            self.last_relative_speed = 50
+
+    def get_link_stats(self):
+        """Command round trip, stroke-period error and script playback metrics (like HandyController's)."""
+        return {"timing": self.timing.stats(), "script_player": self.script_player.stats(),
+                "rate_limit": self.rate_limiter.stats() if self.rate_limiter else None}
+
     def test_movement(self):
         """Test device movement with a simple pattern."""
         if not self.is_connected:
@@ -389,27 +457,23 @@ class ButtplugController:
             print("Cannot stop: No device connected")
             return
             
-        # Deactivate continuous movement
+        # Deactivate continuous movement and script playback
         self._movement_active = False
+        self.script_player.set_script(None)
         
         async def do_stop():
             try:
                 print("Stopping all device movements...")
                 
-                # Stop vibrator actuators
-                for actuator in self._vibrator_actuators:
-                    print(f"  Stopping vibrator actuator {actuator.index}")
-                    await actuator.command(0.0)
-                
-                # Stop linear actuators (move to center position)
-                for actuator in self._linear_actuators:
-                    print(f"  Stopping linear actuator {actuator.index}")
-                    await actuator.command(500, 0.5)  # 500ms duration, center position
-                
-                # Stop rotatory actuators
-                for actuator in self._rotatory_actuators:
-                    print(f"  Stopping rotatory actuator {actuator.index}")
-                    await actuator.command(0.0, True)  # Stop rotation
+                # Stop every actuator kind at once: vibrators off, linear to center over 500ms, rotation off
+                device = self.device
+                if self.rate_limiter is not None:
+                    self.rate_limiter.clear()  # queued moves are stale now
+                await asyncio.gather(
+                    self.timing.call(send_scalar(device, self._vibrator_actuators, 0.0)),
+                    self.timing.call(send_linear(device, self._linear_actuators, 500, 0.5)),
+                    self.timing.call(send_rotate(device, self._rotatory_actuators, 0.0, True)),
+                )
                     
                 # Update UI state
                 with self._lock:
@@ -447,6 +511,13 @@ class ButtplugController:
             # Create the async disconnect task
             async def do_disconnect():
                 try:
+                    # Acks for commands still in flight will never come
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.clear()
+                    cancelled = self.timing.cancel_all()
+                    if cancelled:
+                        print(f"Cancelled {cancelled} unacknowledged command(s).")
+
                     # Disconnect the client if connected
                     if self._connected and hasattr(self.client, 'disconnect'):
                         await self.client.disconnect()
@@ -0,0 +1,70 @@
+# buttplug_dispatch.py
+"""
+One message per device per step for multi-actuator devices.
+
+Actuator.command() sends one message per actuator and waits for each reply, so a device with
+several motors pays one server round trip per actuator and its motors drift apart. These helpers
+pack every actuator of a kind into a single multi-vector LinearCmd / ScalarCmd / VibrateCmd /
+RotateCmd, which the server applies together. Actuator types without a multi-vector form are
+commanded concurrently with asyncio.gather.
+"""
+import asyncio
+
+from buttplug.client.client import LinearActuator, RotatoryActuator, ScalarActuator, VibrateActuator
+from buttplug.errors import UnexpectedMessageError
+from buttplug.messages import v0, v1, v3
+
+def unique_actuators(actuators):
+    """Drop duplicates (the controller may find the same actuator via two device attributes)."""
+    seen, out = set(), []
+    for actuator in actuators:
+        key = (type(actuator).__name__, actuator.index)
+        if key not in seen:
+            seen.add(key)
+            out.append(actuator)
+    return out
+
+async def _send(device, message, what):
+    reply = await device.send(message)
+    if isinstance(reply, v0.Error):
+        raise reply.error_code.exception(reply.error_message)
+    if not isinstance(reply, v0.Ok):
+        raise UnexpectedMessageError(f"while sending {what} (device: {device.index}):\n{reply}")
+
+async def send_linear(device, actuators, duration_ms, position):
+    """Move every linear actuator to `position` (0-1) over `duration_ms`, in one LinearCmd."""
+    actuators = unique_actuators(actuators)
+    linear = [a for a in actuators if isinstance(a, LinearActuator)]
+    others = [a.command(int(duration_ms), position) for a in actuators if not isinstance(a, LinearActuator)]
+    jobs = list(others)
+    if linear:
+        message = v1.LinearCmd(device.index, [v1.Vector(a.index, int(duration_ms), position) for a in linear])
+        jobs.append(_send(device, message, f"linear command ({duration_ms}ms, {position})"))
+    if jobs:
+        await asyncio.gather(*jobs)
+
+async def send_scalar(device, actuators, level):
+    """Set every vibrator-like actuator to `level` (0-1): one ScalarCmd (v3) and/or one VibrateCmd (v1)."""
+    actuators = unique_actuators(actuators)
+    scalar = [a for a in actuators if isinstance(a, ScalarActuator)]
+    vibrate = [a for a in actuators if isinstance(a, VibrateActuator)]
+    jobs = [a.command(level) for a in actuators if not isinstance(a, (ScalarActuator, VibrateActuator))]
+    if scalar:
+        message = v3.ScalarCmd(device.index, [v3.Scalar(a.index, level, a.type) for a in scalar])
+        jobs.append(_send(device, message, f"scalar command {level}"))
+    if vibrate:
+        message = v1.VibrateCmd(device.index, [v1.Speed(a.index, level) for a in vibrate])
+        jobs.append(_send(device, message, f"vibrate command {level}"))
+    if jobs:
+        await asyncio.gather(*jobs)
+
+async def send_rotate(device, actuators, speed, clockwise=True):
+    """Spin every rotatory actuator at `speed` (0-1), in one RotateCmd."""
+    actuators = unique_actuators(actuators)
+    rotatory = [a for a in actuators if isinstance(a, RotatoryActuator)]
+    jobs = [a.command(speed, clockwise) for a in actuators if not isinstance(a, RotatoryActuator)]
+    if rotatory:
+        message = v1.RotateCmd(device.index, [v1.Rotation(a.index, speed, clockwise) for a in rotatory])
+        jobs.append(_send(device, message, f"rotate command ({speed}, {clockwise})"))
+    if jobs:
+        await asyncio.gather(*jobs)
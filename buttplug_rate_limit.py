@@ -0,0 +1,94 @@
+# buttplug_rate_limit.py
+import asyncio
+import time
+
+# Used when the server doesn't report a DeviceMessageTimingGap (ms) for the device
+DEFAULT_GAP_MS = 20
+# Commands that may go out back to back before the gap applies (e.g. a linear and a vibrate command)
+DEFAULT_BURST = 2
+# How soon to look again while too many commands are waiting for an ack
+SATURATED_RETRY_S = 0.01
+
+class DeviceRateLimiter:
+    """
+    Token bucket in front of one device's commands, refilled at one token per message timing gap.
+
+    Commands are keyed by kind ("linear", "scalar", "rotate"). When no token is available the
+    command waits, and a newer command of the same kind replaces it (coalesced): the device always
+    gets the newest target as soon as it can take one, instead of working through a backlog of
+    stale moves. Commands are also held while CommandTiming has too many unacknowledged, so a
+    stalled link coalesces instead of piling up tasks. Jobs are factories, so a coalesced command
+    never creates its coroutine. Runs entirely on the controller's event loop.
+    """
+
+    def __init__(self, timing, min_gap_s, burst=DEFAULT_BURST):
+        self.timing = timing
+        self.min_gap_s = max(0.0, float(min_gap_s))
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._pending = {}  # kind -> (factory, period_s), insertion order = send order
+        self._flush_handle = None
+
+        # Metrics
+        self.submitted = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    @classmethod
+    def for_gap_ms(cls, gap_ms, timing, burst=DEFAULT_BURST):
+        """Limiter for a device's DeviceMessageTimingGap (ms); DEFAULT_GAP_MS when the server gives none."""
+        if not gap_ms or gap_ms < 0:
+            gap_ms = DEFAULT_GAP_MS
+        return cls(timing, gap_ms / 1000.0, burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.min_gap_s <= 0:
+            self._tokens = float(self.burst)
+        else:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) / self.min_gap_s)
+        self._refilled_at = now
+
+    def submit(self, kind, factory, period_s=None):
+        """Send now if the device can take it, else hold it as the newest `kind` command."""
+        self.submitted += 1
+        if kind in self._pending:
+            del self._pending[kind]
+            self.coalesced += 1
+        self._pending[kind] = (factory, period_s)
+        self._flush()
+
+    def _flush(self):
+        self._flush_handle = None
+        self._refill()
+        while self._pending and self._tokens >= 1.0 and not self.timing.saturated:
+            kind = next(iter(self._pending))
+            factory, period_s = self._pending.pop(kind)
+            self._tokens -= 1.0
+            self.sent += 1
+            self.timing.dispatch(factory(), period_s=period_s)
+        if self._pending and self._flush_handle is None:
+            wait_s = max(0.0, 1.0 - self._tokens) * self.min_gap_s
+            if self.timing.saturated:
+                wait_s = max(wait_s, self.min_gap_s, SATURATED_RETRY_S)
+            self._flush_handle = asyncio.get_running_loop().call_later(wait_s, self._flush)
+
+    def clear(self):
+        """Drop everything still waiting (before a stop, or when the device goes away)."""
+        self.dropped += len(self._pending)
+        self._pending.clear()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    def stats(self):
+        return {
+            "min_gap_ms": round(self.min_gap_s * 1000.0, 1),
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,152 @@
+# buttplug_script_player.py
+import asyncio
+import time
+from functools import partial
+
+from buttplug_dispatch import send_linear, send_rotate, send_scalar
+from compiled_script import compile_script
+
+# Buttplug positions are 0-1, so scripts are compiled against a 100-unit travel with no velocity cap
+BUTTPLUG_TRAVEL = 100.0
+BUTTPLUG_MAX_VELOCITY = 1e9
+# Shortest move we ask the device for (loop wrap-around, first move into the script)
+MIN_SEGMENT_MS = 50
+FIRST_MOVE_MS = 300
+# Stroke speed (script % per second) that maps to full intensity on vibrators/rotators
+FULL_INTENSITY_PCT_S = 400.0
+
+def script_segments(script):
+    """
+    (start_ms, duration_ms, position 0-1) for each move of one cycle of a CompiledScript.
+    LinearCmd means "reach this position over this duration", so the move that starts at action i
+    targets action i + 1; the last one wraps around to the first action of the next cycle.
+    """
+    times, pos = script.times_ms, script.pos_pct
+    n = len(times)
+    segments = []
+    for i in range(n):
+        if i + 1 < n:
+            duration = times[i + 1] - times[i]
+            target = pos[i + 1]
+        else:
+            duration = script.cycle_ms - times[i] + times[0]
+            target = pos[0]
+        segments.append((times[i], max(MIN_SEGMENT_MS, int(duration)), max(0.0, min(1.0, target / 100.0))))
+    return segments
+
+class ButtplugScriptPlayer:
+    """
+    Plays the same compiled scripts as ScriptPlayer on a Buttplug device, from the controller's event loop.
+    Segments are computed once per script; each command goes out through the controller's rate limiter
+    and CommandTiming half a measured round trip before it is due, without waiting for the previous acknowledgement,
+    so a slow link never stretches the script.
+    Vibrate/rotate-only devices get an intensity that follows the script's stroke speed.
+    """
+
+    def __init__(self, controller, lead_s=None):
+        self.controller = controller
+        self._fixed_lead_s = lead_s  # None: follow the measured round trip
+        # (script, segments, loop), replaced as one tuple so the loop never sees a mix of two scripts
+        self._state = (None, [], True)
+        self._changed = None  # asyncio.Event, created on the controller's loop
+
+        # Metrics
+        self.commands = 0
+        self.late_max_ms = 0.0
+
+    @property
+    def lead_s(self):
+        return self.controller.timing.lead_s if self._fixed_lead_s is None else self._fixed_lead_s
+
+    @property
+    def _script(self):
+        return self._state[0]
+
+    @property
+    def active(self):
+        return self._script is not None
+
+    def set_script(self, script, loop=True):
+        """Thread-safe. script is a player script dict or a CompiledScript (reused as-is); None stops playback."""
+        compiled = compile_script(script, BUTTPLUG_TRAVEL, BUTTPLUG_MAX_VELOCITY) if script is not None else None
+        segments = script_segments(compiled) if compiled is not None else []
+        self._state = (compiled, segments, loop)
+        if self._changed is not None:
+            self.controller.loop.call_soon_threadsafe(self._changed.set)
+
+    async def run(self):
+        self._changed = asyncio.Event()
+        if self._script is not None:  # set before this task started
+            self._changed.set()
+        while not self.controller._shutting_down:
+            await self._changed.wait()
+            self._changed.clear()
+            script, segments, loop = self._state
+            if script is None or not segments:
+                continue
+            try:
+                await self._play(script, segments, loop)
+            except Exception as e:
+                print(f"Error in Buttplug script playback: {e}")
+
+    async def _play(self, script, segments, loop):
+        c = self.controller
+        if not c.is_connected or not c.device:
+            return
+        # Glide to the script's first position, then run its moves against one monotonic origin
+        c.timing.reset_period()
+        self._dispatch(FIRST_MOVE_MS, max(0.0, min(1.0, script.pos_pct[0] / 100.0)), 0.0)
+        # (the glide left now, i.e. lead_s early for a move due lead_s from now)
+        start = time.monotonic() + self.lead_s + FIRST_MOVE_MS / 1000.0 - script.times_ms[0] / 1000.0
+        while self._script is script and not c._shutting_down:
+            prev_pos = script.pos_pct[0] / 100.0
+            for start_ms, duration_ms, position in segments:
+                send_at = start + start_ms / 1000.0 - self.lead_s
+                if await self._wait_until(send_at, script):
+                    return
+                self.late_max_ms = max(self.late_max_ms, (time.monotonic() - send_at) * 1000.0)
+                self._dispatch(duration_ms, position, abs(position - prev_pos) * 100.0 / (duration_ms / 1000.0))
+                prev_pos = position
+            if not loop:
+                if self._state[0] is script:  # unless a new script arrived meanwhile
+                    self._state = (None, [], True)
+                return
+            start += script.cycle_s
+            # After a long stall, restart the cycle now rather than replaying missed moves
+            if time.monotonic() - start > script.cycle_s:
+                start = time.monotonic()
+                c.timing.reset_period()
+
+    async def _wait_until(self, deadline, script):
+        """Sleep until deadline; True if the script was replaced or stopped meanwhile."""
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        return self._script is not script or self._changed.is_set()
+
+    def _dispatch(self, duration_ms, position, speed_pct_s):
+        c = self.controller
+        device = c.device
+        if device is None:
+            return
+        level = min(1.0, speed_pct_s / FULL_INTENSITY_PCT_S)
+        if c._linear_actuators:
+            kind, job = "linear", partial(send_linear, device, c._linear_actuators, duration_ms, position)
+        elif c._vibrator_actuators:
+            kind, job = "scalar", partial(send_scalar, device, c._vibrator_actuators, level)
+        elif c._rotatory_actuators:
+            kind, job = "rotate", partial(send_rotate, device, c._rotatory_actuators, level, True)
+        else:
+            return
+        c._submit_command(kind, job, duration_ms / 1000.0)
+        self.commands += 1
+
+    def stats(self):
+        return {
+            "playing": self.active,
+            "commands": self.commands,
+            "late_max_ms": round(self.late_max_ms, 1),
+        }
@@ -0,0 +1,150 @@
+# buttplug_timing.py
+import asyncio
+import time
+
+# Until the first acknowledgement arrives, assume a typical local Intiface round trip
+DEFAULT_RTT_S = 0.05
+# The lead is capped so one slow ack can't make us send strokes wildly early
+MAX_LEAD_S = 0.25
+# Unacknowledged commands allowed at once; past this, new ones are skipped (callers coalesce instead)
+MAX_IN_FLIGHT = 8
+# A command not acknowledged by then counts as an error, so a dead link shows up instead of piling up tasks
+ACK_TIMEOUT_S = 2.0
+
+class CommandTiming:
+    """
+    Fire-and-forget sender for Buttplug commands that measures what it costs.
+
+    The acknowledgement time of every command (Client.send resolving) feeds an EWMA round trip;
+    the device starts moving about half a round trip after we send, so callers schedule each
+    command `lead_s` before it is due instead of sending on time and sleeping through the ack.
+    Consecutive dispatches are compared with the period the previous command asked for, giving
+    the stroke-period error (how much each stroke is stretched or squeezed on the device).
+    At most max_in_flight commands wait for an ack at once, each for at most ack_timeout_s.
+    """
+
+    def __init__(self, alpha=0.2, max_lead_s=MAX_LEAD_S, max_in_flight=MAX_IN_FLIGHT, ack_timeout_s=ACK_TIMEOUT_S):
+        self._alpha = alpha
+        self.max_lead_s = max_lead_s
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.ack_timeout_s = ack_timeout_s
+        self._in_flight = set()
+        self._last_start = None
+        self._last_period_s = None
+
+        # Metrics
+        self.sent = 0
+        self.acked = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.skipped = 0
+        self.rtt_avg_s = DEFAULT_RTT_S
+        self.rtt_last_s = 0.0
+        self.rtt_max_s = 0.0
+        self.periods = 0
+        self.period_err_total_s = 0.0
+        self.period_err_max_s = 0.0
+        self.period_err_last_s = 0.0
+
+    @property
+    def lead_s(self):
+        return min(self.max_lead_s, self.rtt_avg_s / 2.0)
+
+    @property
+    def saturated(self):
+        """True while max_in_flight commands are unacknowledged; callers should hold (and coalesce) new ones."""
+        return len(self._in_flight) >= self.max_in_flight
+
+    def reset_period(self):
+        """Forget the previous command (playback paused or restarted), so the gap isn't counted as error."""
+        self._last_start = self._last_period_s = None
+
+    def dispatch(self, job, period_s=None):
+        """
+        Start sending `job` (a coroutine) now, from the event loop, without waiting for the ack.
+        period_s is how long this command's move lasts (None for commands that aren't strokes).
+        Returns the task, or None if the job was skipped because too many commands are unacknowledged.
+        """
+        if self.saturated:
+            job.close()
+            self.skipped += 1
+            return None
+        sent_at = time.monotonic()
+        if period_s is not None:
+            # Estimated moment the device starts this move
+            start = sent_at + self.rtt_avg_s / 2.0
+            if self._last_start is not None:
+                err = (start - self._last_start) - self._last_period_s
+                self.periods += 1
+                self.period_err_last_s = err
+                self.period_err_total_s += abs(err)
+                self.period_err_max_s = max(self.period_err_max_s, abs(err))
+            self._last_start, self._last_period_s = start, period_s
+        return self._start(job, sent_at)
+
+    async def call(self, job):
+        """
+        Send `job` and wait for its ack (stop commands). Never skipped, but it shares dispatch's
+        ack deadline, error counting and cancel_all, so every command has one timeout and one cleanup path.
+        """
+        return await self._start(job, time.monotonic())
+
+    def _start(self, job, sent_at):
+        task = asyncio.ensure_future(asyncio.wait_for(job, self.ack_timeout_s) if self.ack_timeout_s else job)
+        self._in_flight.add(task)
+        task.add_done_callback(lambda t: self._on_done(t, sent_at, job))
+        self.sent += 1
+        return task
+
+    def cancel_all(self):
+        """Cancel every command still waiting for an ack (the connection is going away). Returns how many."""
+        tasks, self._in_flight = self._in_flight, set()
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def _on_done(self, task, sent_at, job):
+        self._in_flight.discard(task)
+        if task.cancelled():
+            job.close()  # cancelled before it started (cancel_all), so nothing else will
+            return
+        if isinstance(task.exception(), asyncio.TimeoutError):
+            self.errors += 1
+            self.timeouts += 1
+            print(f"Buttplug command not acknowledged within {self.ack_timeout_s}s")
+            return
+        if task.exception() is not None:
+            self.errors += 1
+            print(f"Buttplug command failed: {task.exception()}")
+            return
+        self.record_rtt(time.monotonic() - sent_at)
+
+    def record_rtt(self, rtt_s):
+        self.acked += 1
+        self.rtt_last_s = rtt_s
+        self.rtt_max_s = max(self.rtt_max_s, rtt_s)
+        if self.acked == 1:
+            self.rtt_avg_s = rtt_s
+        else:
+            self.rtt_avg_s += self._alpha * (rtt_s - self.rtt_avg_s)
+
+    @property
+    def in_flight(self):
+        return len(self._in_flight)
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "acked": self.acked,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "in_flight": self.in_flight,
+            "rtt_last_ms": round(self.rtt_last_s * 1000.0, 1),
+            "rtt_avg_ms": round(self.rtt_avg_s * 1000.0, 1),
+            "rtt_max_ms": round(self.rtt_max_s * 1000.0, 1),
+            "lead_ms": round(self.lead_s * 1000.0, 1),
+            "period_err_last_ms": round(self.period_err_last_s * 1000.0, 1),
+            "period_err_mean_ms": round(self.period_err_total_s / self.periods * 1000.0, 1) if self.periods else 0.0,
+            "period_err_max_ms": round(self.period_err_max_s * 1000.0, 1),
+        }
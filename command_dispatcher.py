@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+
+def _failed(result):
+    """Senders return a response (None when the request never completed) or, for jobs, a bool."""
+    return result is None or result is False or not getattr(result, "ok", True)
+
+class CommandDispatcher(threading.Thread):
+    """
+    Sends device commands from a dedicated thread so callers never block on HTTP.
+    Pending commands are coalesced by key: a newer target replaces an unsent older one,
+    so a slow link drops stale positions instead of building up lag.
+    """
+
+    def __init__(self, send_func, max_pending=8, latency_alpha=0.2):
+        super().__init__(daemon=True, name="HandyCommandDispatcher")
+        self._send = send_func
+        self.max_pending = max(1, int(max_pending))
+        self._alpha = latency_alpha
+        self._pending = OrderedDict()  # key -> (path, body, send)
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+
+        # Metrics
+        self.submitted = 0
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_latency_ms = 0.0
+        self.avg_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def submit(self, path, body=None, coalesce_key=None, send=None, flush=False):
+        """
+        Queue a command. Commands sharing a key (default: the path) replace each other until sent.
+        send(path, body) replaces the default sender for this command, for multi-request jobs that
+        must stay ordered with the plain commands around them (e.g. an HSSP upload and start).
+        flush=True drops everything still queued first, atomically (stop commands).
+        """
+        key = path if coalesce_key is None else coalesce_key
+        with self._cond:
+            if flush:
+                self.dropped += len(self._pending)
+                self._pending.clear()
+            if key in self._pending:
+                del self._pending[key]
+                self.dropped += 1
+            elif len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._pending[key] = (path, body, send)
+            self.submitted += 1
+            self._cond.notify()
+
+    def clear(self):
+        """Drop everything not yet sent (e.g. before a stop command)."""
+        with self._cond:
+            self.dropped += len(self._pending)
+            self._pending.clear()
+
+    @property
+    def depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stop(self):
+        """Stop after flushing what is already queued."""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop_event.is_set():
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                _, (path, body, send) = self._pending.popitem(last=False)
+
+            start = time.perf_counter()
+            try:
+                if _failed((send or self._send)(path, body)):
+                    self.errors += 1
+            except Exception:
+                self.errors += 1
+            if send is None:
+                self._record_latency((time.perf_counter() - start) * 1000.0)
+            else:
+                self.sent += 1  # multi-request jobs would skew the per-command latency the player leads by
+
+    def _record_latency(self, latency_ms):
+        self.sent += 1
+        self.last_latency_ms = latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        if self.sent == 1:
+            self.avg_latency_ms = latency_ms
+        else:
+            self.avg_latency_ms += self._alpha * (latency_ms - self.avg_latency_ms)
+
+    def stats(self):
+        return {
+            "queue_depth": self.depth,
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_latency_ms": round(self.last_latency_ms, 1),
+            "avg_latency_ms": round(self.avg_latency_ms, 1),
+            "max_latency_ms": round(self.max_latency_ms, 1),
+        }
@@ -0,0 +1,99 @@
+from array import array
+
+# Pause between loop repeats of a script
+LOOP_GAP_MS = 10.0
+# Velocity used for the final action, which has no successor to time against
+TAIL_VELOCITY_MM_S = 60.0
+
+class CompiledScript:
+    """
+    Array-backed form of a player script ({'actions': [{'at', 'pos_pct'}], 'duration_ms'}).
+    Targets and velocities are precomputed for one (travel, max velocity) pair, so playback
+    and loop repeats do no per-point math.
+    """
+    __slots__ = ("name", "times_ms", "pos_pct", "target_mm", "velocities", "cycle_ms", "limits")
+
+    def __init__(self, name, times_ms, pos_pct, target_mm, velocities, cycle_ms, limits):
+        self.name = name
+        self.times_ms = times_ms
+        self.pos_pct = pos_pct
+        self.target_mm = target_mm
+        self.velocities = velocities
+        self.cycle_ms = cycle_ms
+        self.limits = limits
+
+    def __len__(self):
+        return len(self.times_ms)
+
+    @property
+    def cycle_s(self):
+        return self.cycle_ms / 1000.0
+
+    def compiled_for(self, full_travel_mm, max_velocity_mm_s):
+        return self.limits == (float(full_travel_mm), float(max_velocity_mm_s))
+
+    def recompile(self, full_travel_mm, max_velocity_mm_s):
+        """Recompute targets/velocities for new limits; timing and positions are reused as-is."""
+        if self.compiled_for(full_travel_mm, max_velocity_mm_s):
+            return self
+        target_mm, velocities = _kinematics(self.times_ms, self.pos_pct, full_travel_mm, max_velocity_mm_s)
+        return CompiledScript(self.name, self.times_ms, self.pos_pct, target_mm, velocities, self.cycle_ms,
+                              (float(full_travel_mm), float(max_velocity_mm_s)))
+
+def _kinematics(times_ms, pos_pct, full_travel_mm, max_velocity_mm_s):
+    target_mm = array("d", ((full_travel_mm * p) / 100.0 for p in pos_pct))
+    velocities = array("d", bytes(8 * len(target_mm)))
+    last = len(target_mm) - 1
+    for i in range(last):
+        dt = max(0.01, (times_ms[i + 1] - times_ms[i]) / 1000.0)
+        # Ideal velocity from the script's timing, capped by the controller's current max speed
+        ideal_vel = max(5.0, abs(target_mm[i + 1] - target_mm[i]) / dt)
+        velocities[i] = min(ideal_vel, max_velocity_mm_s)
+    if last >= 0:
+        velocities[last] = TAIL_VELOCITY_MM_S
+    return target_mm, velocities
+
+def reachable_script(script):
+    """
+    Player script of the positions a device moving no faster than the CompiledScript's velocity cap
+    actually reaches. Streamed playback enforces the cap per command; scripts the device plays on its
+    own (HSSP uploads) must have it baked into the positions instead.
+    """
+    full_travel_mm, max_velocity_mm_s = script.limits
+    actions = []
+    reached = script.pos_pct[0] if len(script) else 0.0
+    for i, (t_ms, pct) in enumerate(zip(script.times_ms, script.pos_pct)):
+        if i:
+            dt = (t_ms - script.times_ms[i - 1]) / 1000.0
+            max_step_pct = max_velocity_mm_s * dt * 100.0 / full_travel_mm
+            reached += max(-max_step_pct, min(max_step_pct, pct - reached))
+        actions.append({"at": int(t_ms), "pos_pct": round(reached, 2)})
+    return {"name": script.name, "actions": actions, "duration_ms": int(script.times_ms[-1]) if actions else 0}
+
+def steps_to_script(steps, name="pattern_playback"):
+    """Player script from ScriptLibrary.scale_to_user steps ({'dp', 'sleep'}); None if there are none."""
+    actions = []
+    current_time = 0
+    for step in steps or []:
+        # The player needs absolute time, so we accumulate the sleep durations
+        actions.append({"at": current_time, "pos_pct": step["dp"]})
+        current_time += int(step["sleep"] * 1000)
+    if not actions:
+        return None
+    return {"name": name, "actions": actions, "duration_ms": current_time}
+
+def compile_script(script, full_travel_mm, max_velocity_mm_s):
+    """Compile a player script dict. Returns None for empty scripts; compiled scripts are recompiled if needed."""
+    if script is None:
+        return None
+    if isinstance(script, CompiledScript):
+        return script.recompile(full_travel_mm, max_velocity_mm_s)
+    acts = script.get("actions") or []
+    if not acts:
+        return None
+    times_ms = array("d", (float(a["at"]) for a in acts))
+    pos_pct = array("d", (float(a["pos_pct"]) for a in acts))
+    target_mm, velocities = _kinematics(times_ms, pos_pct, full_travel_mm, max_velocity_mm_s)
+    cycle_ms = max(float(script.get("duration_ms") or 0), times_ms[-1]) + LOOP_GAP_MS
+    return CompiledScript(script.get("name", ""), times_ms, pos_pct, target_mm, velocities, cycle_ms,
+                          (float(full_travel_mm), float(max_velocity_mm_s)))
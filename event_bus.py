@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from collections import deque
+
+class Subscription:
+    """One listener's bounded event queue. When a slow client falls behind, its oldest events are dropped."""
+
+    def __init__(self, max_events=100):
+        self._events = deque(maxlen=max_events)
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, event, data):
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append((event, data))
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return every queued (event, data) pair, waiting up to timeout for one. [] on timeout or close."""
+        with self._cond:
+            if not self._events and not self.closed:
+                self._cond.wait(timeout)
+            batch = list(self._events)
+            self._events.clear()
+            return batch
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+class EventBus:
+    """Fan-out of UI events (chat, audio_ready, status, mode) to every connected push client."""
+
+    def __init__(self, max_events=100):
+        self.max_events = max_events
+        self._subs = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self):
+        sub = Subscription(self.max_events)
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+        sub.close()
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subs)
+
+    def publish(self, event, data=None):
+        with self._lock:
+            subs = list(self._subs)
+        self.published += 1
+        for sub in subs:
+            sub.put(event, data)
+
+    def watch(self, event, snapshot_func, interval_s=0.25):
+        """
+        Publish snapshot_func() as `event` whenever it changes. Snapshots are only taken while
+        someone is subscribed, so an idle server does no work. Returns the daemon thread.
+        """
+        def loop():
+            last = None
+            while True:
+                time.sleep(interval_s)
+                if not self.subscriber_count:
+                    last = None
+                    continue
+                try:
+                    snap = snapshot_func()
+                except Exception as e:
+                    print(f"Event snapshot for '{event}' failed: {e}")
+                    continue
+                if snap != last:
+                    last = snap
+                    self.publish(event, snap)
+
+        thread = threading.Thread(target=loop, daemon=True, name=f"EventWatch-{event}")
+        thread.start()
+        return thread
+
+def format_sse(event, data):
+    """Encode one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
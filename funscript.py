@@ -0,0 +1,31 @@
+import hashlib
+import json
+
+# Convention reminder: player scripts use 'pos_pct' (0 = base, 100 = tip), funscripts use 'pos'.
+
+def script_to_funscript(script: dict) -> dict:
+    """Convert a player script ({'actions': [{'at', 'pos_pct'}]}) into a funscript dict."""
+    actions = []
+    last_at = None
+    for a in sorted((script or {}).get("actions") or [], key=lambda x: x["at"]):
+        at = int(round(float(a["at"])))
+        pos = a["pos_pct"] if "pos_pct" in a else a.get("pos", 50)
+        pos = int(round(max(0.0, min(100.0, float(pos)))))
+        if at == last_at:
+            # Funscripts must have strictly increasing timestamps; keep the newest position.
+            actions[-1]["pos"] = pos
+            continue
+        actions.append({"at": at, "pos": pos})
+        last_at = at
+    return {
+        "version": "1.0",
+        "inverted": False,
+        "range": 100,
+        "metadata": {"title": (script or {}).get("name", "strokegpt")},
+        "actions": actions,
+    }
+
+def funscript_bytes(script: dict) -> tuple[bytes, str]:
+    """Serialize a player script as compact funscript JSON. Returns (payload, sha256 hex digest)."""
+    payload = json.dumps(script_to_funscript(script), separators=(",", ":")).encode("utf-8")
+    return payload, hashlib.sha256(payload).hexdigest()
@@ -1,14 +1,55 @@
 import sys
+import threading
 import requests
 import time
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from command_dispatcher import CommandDispatcher
+from compiled_script import compile_script, reachable_script, steps_to_script
+from funscript import funscript_bytes
 from script_engine import ScriptEngine, Intent
 from script_player import ScriptPlayer
 from llm_service import LLMService
 
+# Handy firmware modes (API v2)
+MODE_HSSP = 1
+MODE_HDSP = 2
+
+# Time-critical commands: a retried position or play is stale by the time it lands, and the backoff
+# would stall the dispatcher behind it, so these paths get an adapter that never retries
+MOTION_PATHS = ("hdsp/", "hamp/", "hssp/play", "hssp/stop")
+
+def _build_session(base_url, pool_size=4, retries=2, backoff_factor=0.2):
+    """A keep-alive session so motion commands reuse one TLS connection instead of handshaking per PUT."""
+    retry = Retry(
+        total=retries, connect=retries, read=retries, status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "PUT"}),  # never replay uploads (POST)
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    motion_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=Retry(total=0, raise_on_status=False))
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # requests picks the longest matching prefix, so control and info calls keep the retrying adapter
+    for path in MOTION_PATHS:
+        session.mount(f"{base_url}{path}", motion_adapter)
+    return session
+
 class HandyController:
-    def __init__(self, handy_key="", llm_service: LLMService = None, base_url="https://www.handyfeeling.com/api/handy/v2/"):
+    def __init__(self, handy_key="", llm_service: LLMService = None, base_url="https://www.handyfeeling.com/api/handy/v2/",
+                 playback_mode="hdsp", hosting_url="https://www.handyfeeling.com/api/hosting/v2/upload",
+                 pool_size=4, retries=2, backoff_factor=0.2, connect_timeout=3.05, read_timeout=10.0,
+                 llm_refinement=True):
         self.handy_key = handy_key
         self.base_url = base_url
+        self.hosting_url = hosting_url
+        # Shared by every request this controller (and its ScriptPlayer) makes
+        self.session = _build_session(base_url, pool_size, retries, backoff_factor)
+        self.timeout = (connect_timeout, read_timeout)
         self.last_stroke_speed = 0
         self.last_depth_pos = 50
         self.last_relative_speed = 50
@@ -19,18 +60,55 @@ class HandyController:
         self.FULL_TRAVEL_MM = 110.0
         self.current_max_velocity_mm_s = 400.0
         
-        self.script_engine = ScriptEngine(llm=llm_service) if llm_service else None
-        
+        self.script_engine = ScriptEngine(llm=llm_service)
+        # Moves start from the local procedural script; the LLM script (if any) replaces it when ready
+        self.llm_refinement = llm_refinement and llm_service is not None
+        self._move_seq = 0
+        self._seq_lock = threading.Lock()
+        # At most one LLM refinement runs at a time; a burst of moves keeps only the newest request
+        self._refine_next = None
+        self._refining = False
+
+        # Motion commands go through a non-blocking sender so a slow PUT never delays the next target
+        self.dispatcher = CommandDispatcher(self._send_command)
+        self.dispatcher.start()
+
         self.script_player = ScriptPlayer(self)
         self.script_player.start()
         self._mode_context = None
 
+        # "hdsp" streams one xava PUT per action; "hssp" uploads the script once and lets the Handy play it
+        self.playback_mode = playback_mode if playback_mode in ("hdsp", "hssp") else "hdsp"
+        self._device_mode = None
+        self._hssp_active = False
+        self._server_time_offset_ms = None
+        self._server_time_synced_at = 0.0
+        self._uploaded_scripts = OrderedDict()  # sha256 -> hosted url
+        if handy_key and self.playback_mode == "hssp":
+            self._prime_server_time()
+
     def _speed_pct_to_max_vel_mm_s(self, pct):
         MAX_PHYSICAL_VELOCITY = 400.0
         return max(5.0, (pct / 100.0) * MAX_PHYSICAL_VELOCITY)
 
     def set_api_key(self, key):
         self.handy_key = key
+        self._device_mode = None
+        self._hssp_active = False
+        self._server_time_offset_ms = None
+        if key and self.playback_mode == "hssp":
+            self._prime_server_time()
+
+    def _prime_server_time(self):
+        """Sync the server clock in the background now, so the first HSSP start doesn't pay for it."""
+        self.dispatcher.submit("servertime", send=lambda *_: self.sync_server_time() is not None)
+
+    def set_playback_mode(self, mode):
+        if mode not in ("hdsp", "hssp"):
+            raise ValueError(f"Unknown playback mode: {mode}")
+        self.playback_mode = mode
+        if mode == "hssp" and self.handy_key and self._server_time_offset_ms is None:
+            self._prime_server_time()
 
     def update_settings(self, min_speed, max_speed, min_depth, max_depth):
         self.min_user_speed = min_speed
@@ -43,9 +121,127 @@ class HandyController:
             return
         headers = {"Content-Type": "application/json", "X-Connection-Key": self.handy_key}
         try:
-            requests.put(f"{self.base_url}{path}", headers=headers, json=body or {}, timeout=10)
+            return self.session.put(f"{self.base_url}{path}", headers=headers, json=body or {}, timeout=self.timeout)
         except requests.exceptions.RequestException as e:
             print(f"[HANDY ERROR] Problem: {e}", file=sys.stderr)
+            return None
+
+    def _get_command(self, path):
+        if not self.handy_key:
+            return None
+        headers = {"X-Connection-Key": self.handy_key}
+        try:
+            return self.session.get(f"{self.base_url}{path}", headers=headers, timeout=self.timeout).json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"[HANDY ERROR] Problem reading {path}: {e}", file=sys.stderr)
+            return None
+
+    # ---------- HSSP (synced script) playback ----------
+    def _set_device_mode(self, mode):
+        if self._device_mode == mode:
+            return True
+        resp = self._send_command("mode", {"mode": mode})
+        if resp is None or not resp.ok:
+            return False
+        self._device_mode = mode
+        return True
+
+    def sync_server_time(self, samples=10):
+        """Estimate the offset between the local clock and Handy server time (ms), averaged over round trips."""
+        offsets = []
+        for _ in range(max(1, int(samples))):
+            sent = time.time() * 1000.0
+            data = self._get_command("servertime")
+            received = time.time() * 1000.0
+            if not data or "serverTime" not in data:
+                continue
+            rtt = received - sent
+            offsets.append(float(data["serverTime"]) + rtt / 2.0 - received)
+        if not offsets:
+            return None
+        self._server_time_offset_ms = sum(offsets) / len(offsets)
+        self._server_time_synced_at = time.time()
+        return self._server_time_offset_ms
+
+    def _estimated_server_time_ms(self):
+        # Clock drift is slow; re-sync every 30 minutes
+        if self._server_time_offset_ms is None or time.time() - self._server_time_synced_at > 1800:
+            if self.sync_server_time() is None:
+                return None
+        return int(round(time.time() * 1000.0 + self._server_time_offset_ms))
+
+    def _upload_script(self, script):
+        payload, sha256 = funscript_bytes(script)
+        if (url := self._uploaded_scripts.get(sha256)):
+            self._uploaded_scripts.move_to_end(sha256)
+            return url, sha256
+        try:
+            resp = self.session.post(self.hosting_url,
+                                     files={"file": ("strokegpt.funscript", payload, "application/json")},
+                                     timeout=self.timeout)
+            url = resp.json().get("url")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"[HANDY ERROR] Problem uploading script: {e}", file=sys.stderr)
+            return None, sha256
+        if url:
+            self._uploaded_scripts[sha256] = url
+            while len(self._uploaded_scripts) > 64:
+                self._uploaded_scripts.popitem(last=False)
+        return url, sha256
+
+    def _play_script_hssp(self, script):
+        """Upload the script once and start it on the device with server-time sync. Returns False on failure."""
+        if not script or not script.get("actions"):
+            return False
+        url, sha256 = self._upload_script(script)
+        if not url or not self._set_device_mode(MODE_HSSP):
+            return False
+        resp = self._send_command("hssp/setup", {"url": url, "sha256": sha256})
+        if resp is None or not resp.ok:
+            return False
+        self._send_command("hssp/loop", {"activated": self.script_player.loop})
+        server_time = self._estimated_server_time_ms()
+        if server_time is None:
+            return False
+        resp = self._send_command("hssp/play", {"estimatedServerTime": server_time, "startTime": 0})
+        if resp is None or not resp.ok:
+            return False
+        self._hssp_active = True
+        return True
+
+    def _leave_hssp(self, *_args):
+        if self._hssp_active:
+            self._send_command("hssp/stop")
+            self._hssp_active = False
+        return self._set_device_mode(MODE_HDSP)
+
+    def _start_hssp(self, script, seq):
+        """Dispatcher job: upload and start `script`, or fall back to streaming it if HSSP fails."""
+        if seq != self._move_seq:
+            return True  # superseded while queued
+        # The device plays uploads on its own, so the user's speed cap is baked into the positions
+        limited = reachable_script(compile_script(script, self.FULL_TRAVEL_MM, self.current_max_velocity_mm_s))
+        if self._play_script_hssp(limited):
+            return True
+        print("[HANDY] HSSP playback failed, falling back to HDSP streaming.", file=sys.stderr)
+        if seq == self._move_seq:
+            self._leave_hssp()
+            self.script_player.set_script(script)
+        return False
+
+    def _play_script(self, script):
+        """
+        Route a player script to the active playback mode, falling back to per-point streaming.
+        Mode switches, uploads and time sync run as dispatcher jobs, so callers never wait on them.
+        """
+        if self.playback_mode == "hssp":
+            self.script_player.set_script(None)
+            seq = self._move_seq
+            self.dispatcher.submit("hssp/script", script, send=lambda _path, body: self._start_hssp(body, seq))
+            return
+        if self._hssp_active or self._device_mode == MODE_HSSP:
+            self.dispatcher.submit("hssp/leave", send=self._leave_hssp)
+        self.script_player.set_script(script)
 
     def _safe_percent(self, p):
         try:
@@ -55,8 +251,11 @@ class HandyController:
         return max(0.0, min(100.0, p))
 
     def move(self, speed, depth, stroke_range, context):
-        """Generative AI move function. Takes an intent and creates a script from scratch."""
-        if not self.handy_key or not self.script_engine:
+        """
+        Starts a procedural script for the intent immediately, then optionally refines it with the LLM
+        (streaming mode only; HSSP plays the procedural upload as is).
+        """
+        if not self.handy_key:
             return
 
         if speed is not None and speed == 0:
@@ -79,14 +278,50 @@ class HandyController:
             tags=tags
         )
 
-        generated_script = self.script_engine.generate_script(
-            intent, context, float(self.min_handy_depth), float(self.max_handy_depth)
-        )
+        seq = self._next_move_seq()
+        min_depth, max_depth = float(self.min_handy_depth), float(self.max_handy_depth)
+
+        self._play_generated(self.script_engine.generate_procedural_script(intent, min_depth, max_depth), intent)
+
+        if self._refines_moves():
+            self._request_refinement(seq, intent, context, min_depth, max_depth)
+
+    def _refines_moves(self):
+        # In HSSP mode a refined script would cost a second upload and restart for every move
+        return self.llm_refinement and self.playback_mode != "hssp"
+
+    def _next_move_seq(self):
+        with self._seq_lock:
+            self._move_seq += 1
+            return self._move_seq
 
+    def _request_refinement(self, seq, intent, context, min_depth, max_depth):
+        with self._seq_lock:
+            self._refine_next = (seq, intent, context, min_depth, max_depth)
+            if self._refining:
+                return  # the running worker picks it up when its LLM call returns
+            self._refining = True
+        threading.Thread(target=self._refine_worker, daemon=True, name="HandyRefinement").start()
+
+    def _refine_worker(self):
+        while True:
+            with self._seq_lock:
+                job, self._refine_next = self._refine_next, None
+                # Requests superseded by a later move or a stop are never sent to the model
+                if job is None or job[0] != self._move_seq:
+                    self._refining = False
+                    return
+            seq, intent, context, min_depth, max_depth = job
+            generated_script = self.script_engine.generate_script(intent, context, min_depth, max_depth)
+            # Drop the result if another move or a stop happened (or HSSP was chosen) while the model was thinking
+            if generated_script and seq == self._move_seq and self._refines_moves():
+                self._play_generated(generated_script, intent)
+
+    def _play_generated(self, generated_script, intent):
         if generated_script:
             for action in generated_script["actions"]:
                 action["pos_pct"] = action.pop("pos")
-            self.script_player.set_script(generated_script)
+            self._play_script(generated_script)
             self.last_relative_speed = intent.speed_pct
             self.last_depth_pos = intent.depth_center_pct
 
@@ -94,37 +329,32 @@ class HandyController:
         """Plays a pre-made pattern from the script library."""
         if not self.handy_key or not steps:
             return
+        self._next_move_seq()
         
         # Convert steps from scale_to_user into a script for the player
-        script_actions = []
-        current_time = 0
-        for step in steps:
-            # The player needs absolute time, so we accumulate the sleep durations
-            script_actions.append({"at": current_time, "pos_pct": step["dp"]})
-            current_time += int(step["sleep"] * 1000)
-
-        if not script_actions:
+        final_script = steps_to_script(steps)
+        if not final_script:
             return
-            
-        final_script = {
-            'name': 'pattern_playback',
-            'actions': script_actions,
-            'duration_ms': current_time
-        }
-        self.script_player.set_script(final_script)
+        self._play_script(final_script)
         
         # We don't have fine-grained speed control here, so we set an average
         self.last_relative_speed = 50
 
     def stop(self):
+        self._next_move_seq()
         self.script_player.set_script(None)
-        try:
-            self._send_command("hamp/stop")
-        except Exception:
-            pass
+        # Anything still queued is stale; the stop lands after the command in flight, never before it
+        self.dispatcher.submit("stop", send=self._stop_device, flush=True)
         self.last_stroke_speed = 0
         self.last_relative_speed = 0
 
+    def _stop_device(self, *_args):
+        """Dispatcher job, so an HSSP start still in flight is known about (and stopped) here."""
+        if self._hssp_active:
+            self._send_command("hssp/stop")
+            self._hssp_active = False
+        return self._send_command("hamp/stop")
+
     def nudge(self, direction, min_depth_pct, max_depth_pct, current_pos_mm):
         JOG_STEP_MM = 2.0
         JOG_VELOCITY_MM_PER_SEC = 20.0
@@ -136,8 +366,11 @@ class HandyController:
             target_mm = min(current_pos_mm + JOG_STEP_MM, max_mm)
         elif direction == 'down':
             target_mm = max(current_pos_mm - JOG_STEP_MM, min_mm)
-        
-        self._send_command(
+
+        if self._hssp_active or self._device_mode == MODE_HSSP:
+            self.dispatcher.submit("hssp/leave", send=self._leave_hssp)
+        # Same key as the player's targets, so the newest of a jog or a queued move wins
+        self.dispatcher.submit(
             "hdsp/xava",
             {"position": target_mm, "velocity": JOG_VELOCITY_MM_PER_SEC, "stopOnTarget": True},
         )
@@ -148,7 +381,7 @@ class HandyController:
             return None
         headers = {"X-Connection-Key": self.handy_key}
         try:
-            resp = requests.get(f"{self.base_url}slide/position/absolute", headers=headers, timeout=10)
+            resp = self.session.get(f"{self.base_url}slide/position/absolute", headers=headers, timeout=self.timeout)
             data = resp.json()
             return float(data.get("position", 0))
         except requests.exceptions.RequestException as e:
@@ -159,4 +392,24 @@ class HandyController:
         return int(round((float(val) / self.FULL_TRAVEL_MM) * 100))
 
     def set_mode_context(self, mode_name=None):
-        self._mode_context = mode_name
\ No newline at end of file
+        self._mode_context = mode_name
+
+    def get_link_stats(self):
+        stats = self.dispatcher.stats()
+        stats["playback"] = self.script_player.stats()
+        stats["script_cache"] = self.script_engine.cache_stats()
+        return stats
+
+    def close(self):
+        """Stop the device and shut down the sender, player and session. Safe to call twice."""
+        if not self.dispatcher.is_alive():
+            return
+        self.stop()
+        self.script_player.stop()
+        self.script_player.join(timeout=2.0)
+        self.dispatcher.stop()
+        self.dispatcher.join(timeout=2.0)
+        self.session.close()
+
+    # Same teardown name as ButtplugController, so /set_interface can drop either kind
+    disconnect = close
\ No newline at end of file
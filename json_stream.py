@@ -0,0 +1,141 @@
+import json
+
+class JsonFieldStream:
+    """
+    Incremental parser for a single streamed JSON object.
+    Text is fed in arbitrary chunks; on_field(key, value) fires once per top-level field,
+    as soon as that field's value is complete (strings, objects and arrays on their closing
+    quote/bracket, numbers and literals on the following ',' or '}').
+    """
+
+    def __init__(self, on_field=None):
+        self._on_field = on_field
+        self._chunks = []
+        self._text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"   # key -> colon -> value -> comma
+        # The key or value being read ("key"/"value"/None): earlier chunks' pieces, and where it starts in this one
+        self._capture = None
+        self._capture_parts = []
+        self._capture_from = 0
+        self._chunk = ""
+        self._key = None
+        self.fields = {}
+        self.done = False
+
+    @property
+    def text(self):
+        # Joined on demand, so feeding stays linear in the reply length
+        if self._chunks:
+            self._text += "".join(self._chunks)
+            self._chunks = []
+        return self._text
+
+    def feed(self, chunk):
+        if not chunk or self.done:
+            return
+        self._chunks.append(chunk)
+        self._chunk = chunk
+        for i, c in enumerate(chunk):
+            self._step(i, c)
+            if self.done:
+                break
+        if self._capture is not None:
+            # Only the open key/value is carried over; the scan never revisits earlier chunks
+            self._capture_parts.append(chunk[self._capture_from:])
+            self._capture_from = 0
+        self._chunk = ""
+
+    def _begin(self, kind, i):
+        self._capture = kind
+        self._capture_parts = []
+        self._capture_from = i
+
+    def _end(self, end):
+        raw = "".join(self._capture_parts) + self._chunk[self._capture_from:end]
+        self._capture = None
+        self._capture_parts = []
+        return raw
+
+    def _step(self, i, c):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._depth == 1:
+                    if self._expect == "colon" and self._capture == "key":
+                        self._key = self._decode(self._end(i + 1))
+                    elif self._expect == "value" and self._capture == "value":
+                        # A string value is complete on its closing quote
+                        self._finish_value(i + 1)
+            return
+
+        if self._depth == 0:
+            if c == "{":
+                self._depth = 1
+                self._expect = "key"
+            return
+
+        if c == '"':
+            self._in_string = True
+            if self._depth == 1:
+                if self._expect == "key":
+                    self._begin("key", i)
+                    self._expect = "colon"
+                elif self._expect == "value" and self._capture is None:
+                    self._begin("value", i)
+        elif c in "{[":
+            if self._depth == 1 and self._expect == "value" and self._capture is None:
+                self._begin("value", i)
+            self._depth += 1
+        elif c in "}]":
+            if self._depth == 1:
+                if self._expect == "value" and self._capture == "value":
+                    self._finish_value(i)
+                self._depth = 0
+                self.done = True
+                return
+            self._depth -= 1
+            if self._depth == 1 and self._expect == "value" and self._capture == "value":
+                # Objects and arrays are complete on their closing bracket
+                self._finish_value(i + 1)
+        elif self._depth == 1:
+            if c == ":" and self._expect == "colon":
+                self._expect = "value"
+                self._capture = None
+            elif c == ",":
+                if self._expect == "value" and self._capture == "value":
+                    self._finish_value(i)
+                self._expect = "key"
+            elif not c.isspace() and self._expect == "value" and self._capture is None:
+                self._begin("value", i)
+
+    def _finish_value(self, end):
+        raw = self._end(end).strip()
+        self._expect = "comma"
+        key = self._key
+        self._key = None
+        if key is None:
+            return
+        try:
+            value = json.loads(raw)
+        except (json.JSONDecodeError, ValueError):
+            return
+        self.fields[key] = value
+        if self._on_field:
+            try:
+                self._on_field(key, value)
+            except Exception as e:
+                print(f"Streamed field handler error for '{key}': {e}")
+
+    @staticmethod
+    def _decode(raw):
+        try:
+            return json.loads(raw)
+        except (json.JSONDecodeError, ValueError):
+            return None
@@ -6,6 +6,8 @@ from typing import List, Dict, Any, Tuple
 import requests
 from urllib.parse import urljoin
 
+from json_stream import JsonFieldStream
+
 
 def _now_ts() -> int:
     try:
@@ -19,6 +21,7 @@ class LLMService:
     Minimal, robust LLM wrapper plus deterministic profile consolidation.
     Exposes:
       - get_chat_response(chat_history, context, temperature=0.7)
+      - get_chat_response_stream(chat_history, context, temperature=0.7, on_field=None)
       - name_this_move(speed, depth, mood)
       - consolidate_user_profile(chat_chunk, current_profile)
     """
@@ -169,6 +172,60 @@ class LLMService:
         messages = [{"role": "system", "content": system_prompt}, *list(chat_history)]
         return self._talk_to_llm(messages, temperature)
 
+    def _talk_to_llm_stream(self, messages: List[Dict[str, str]], temperature: float = 0.7, on_field=None) -> Dict[str, Any]:
+        """
+        Streaming variant of _talk_to_llm. Consumes the chunked reply and calls on_field(key, value)
+        for each top-level field of the model's JSON as soon as it is complete.
+        Falls back to the blocking call if the stream fails before anything was emitted.
+        """
+        parser = JsonFieldStream(on_field)
+        try:
+            with requests.post(
+                self.url,
+                json={
+                    "model": self.model,
+                    "stream": True,
+                    "format": "json",
+                    "options": {
+                        "temperature": temperature,
+                        "top_p": 0.95,
+                        "repeat_penalty": 1.2,
+                        "repeat_penalty_last_n": 40,
+                    },
+                    "messages": messages,
+                },
+                stream=True,
+                timeout=(5, 60),
+            ) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    parser.feed((chunk.get("message") or {}).get("content", ""))
+                    if chunk.get("done") or parser.done:
+                        break
+        except Exception as e:
+            if not parser.fields:
+                print(f"LLM stream failed, retrying without streaming: {e}")
+                return self._talk_to_llm(messages, temperature)
+            print(f"LLM stream ended early: {e}")
+
+        try:
+            start = parser.text.find("{")
+            end = parser.text.rfind("}") + 1
+            if start != -1 and end > start:
+                return json.loads(parser.text[start:end])
+        except Exception:
+            pass
+        # Truncated or malformed output: keep whatever fields did complete
+        return parser.fields or {"chat": "", "action_tag": None, "modifiers": None}
+
+    def get_chat_response_stream(self, chat_history: List[Dict[str, str]], context: Dict[str, Any], temperature: float = 0.7, on_field=None):
+        system_prompt = self._build_system_prompt(context)
+        messages = [{"role": "system", "content": system_prompt}, *list(chat_history)]
+        return self._talk_to_llm_stream(messages, temperature, on_field=on_field)
+
     # ------------------ Utility prompts -------------------
     def name_this_move(self, speed: int, depth: int, mood: str) -> str:
         prompt = (
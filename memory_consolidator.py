@@ -0,0 +1,101 @@
+import threading
+import time
+
+class MemoryConsolidator(threading.Thread):
+    """
+    Runs user-profile consolidation in the background so the reply path never waits on it.
+    A run is triggered every `every_n_messages` new messages, or after `interval_s` if any
+    messages are pending. The reply path just reads `settings.user_profile`, which always holds
+    the last consolidated profile.
+    """
+
+    def __init__(self, llm, chat_history, settings, every_n_messages=6, interval_s=120.0, window=12, enabled=None):
+        super().__init__(daemon=True, name="MemoryConsolidator")
+        self.llm = llm
+        self.chat_history = chat_history
+        self.settings = settings
+        self.every_n_messages = max(1, int(every_n_messages))
+        self.interval_s = interval_s
+        self.window = max(1, int(window))
+        self._enabled = enabled or (lambda: True)
+
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._run_lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self._pending = 0
+
+        # Metrics
+        self.runs = 0
+        self.errors = 0
+        self.last_duration_s = 0.0
+        self.max_duration_s = 0.0
+        self.last_consolidated_at = None
+
+    def note_message(self):
+        """Call after appending to chat_history; wakes the worker once enough messages have piled up."""
+        with self._count_lock:
+            self._pending += 1
+            due = self._pending >= self.every_n_messages
+        if due:
+            self._wake.set()
+
+    @property
+    def pending_messages(self):
+        return self._pending
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def flush(self):
+        """Consolidate anything pending right now, in the caller's thread (e.g. on exit)."""
+        if self._pending:
+            self.consolidate()
+
+    def consolidate(self):
+        if not self._enabled():
+            return False
+        with self._run_lock:
+            # Only counted off once saved: a failed batch is retried on the next run, not dropped
+            with self._count_lock:
+                pending = self._pending
+            chunk = list(self.chat_history)[-max(self.window, pending):]
+            if not chunk:
+                return False
+            start = time.monotonic()
+            try:
+                profile = self.llm.consolidate_user_profile(chunk, self.settings.user_profile or {})
+                self.settings.user_profile = profile
+                self.settings.save()
+            except Exception as e:
+                self.errors += 1
+                print(f"Profile consolidation error: {e}")
+                return False
+            finally:
+                self.last_duration_s = time.monotonic() - start
+                self.max_duration_s = max(self.max_duration_s, self.last_duration_s)
+            with self._count_lock:
+                self._pending = max(0, self._pending - pending)
+            self.runs += 1
+            self.last_consolidated_at = time.time()
+            return True
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+            if self._stop_event.is_set():
+                break
+            if self._pending:
+                self.consolidate()
+
+    def stats(self):
+        return {
+            "pending_messages": self._pending,
+            "runs": self.runs,
+            "errors": self.errors,
+            "profile_age_s": round(time.time() - self.last_consolidated_at, 1) if self.last_consolidated_at else None,
+            "last_duration_s": round(self.last_duration_s, 3),
+            "max_duration_s": round(self.max_duration_s, 3),
+        }
@@ -0,0 +1,162 @@
+import random
+
+# Weight factors used by ScriptLibrary.select
+GENERIC_FACTOR = 0.85
+PREFERRED_BONUS = 1.35
+# Upper bound of the per-query factor (recency <= 1, preferred tag bonus), i.e. the rejection envelope
+QUERY_FACTOR_MAX = PREFERRED_BONUS
+# When avoided patterns hold this much of a bank's weight, rejection sampling wastes too many draws
+MAX_AVOIDED_MASS = 0.75
+
+ALL = "*"
+
+class FenwickTree:
+    """Prefix sums over non-negative weights: O(log n) point updates and weighted index lookup."""
+
+    def __init__(self, weights):
+        self.n = len(weights)
+        self._tree = [0.0] * (self.n + 1)
+        for i, w in enumerate(weights, 1):
+            self._tree[i] += w
+            parent = i + (i & -i)
+            if parent <= self.n:
+                self._tree[parent] += self._tree[i]
+        self.total = float(sum(weights))
+        self._top = 1 << (self.n.bit_length() - 1) if self.n else 0
+
+    def add(self, i, delta):
+        self.total += delta
+        i += 1
+        while i <= self.n:
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, value):
+        """Index i such that prefix(i) <= value < prefix(i + 1)."""
+        pos = 0
+        step = self._top
+        while step:
+            nxt = pos + step
+            if nxt <= self.n and self._tree[nxt] <= value:
+                pos = nxt
+                value -= self._tree[nxt]
+            step >>= 1
+        return min(pos, self.n - 1)
+
+class PatternIndex:
+    """
+    Selection index for ScriptLibrary, built once at ingest time.
+    Every pattern gets a slot with its static weight ((1 + boost) x generic penalty), pre-lowercased
+    tags and a tag bitmask. Per-zone Fenwick trees (plus one over all patterns) sample by static
+    weight in O(log n); per-query factors (recency, preferred tags, avoid lists) are applied by
+    rejection, which keeps the exact distribution of the full weighted scan.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.names = []
+        self.classes = []
+        self.tags_lower = []
+        self.masks = []
+        self.base = []
+        self._tag_bits = {}
+        self._members = {ALL: []}      # zone -> [slot]
+        self._local = {}               # (zone, slot) -> position in that zone's tree
+        self._by_name = {}             # name -> [slot]
+        self._class_mass = {}          # (zone, class) -> summed static weight
+        self._trees = {}               # zone -> FenwickTree, built lazily
+
+    def add(self, entry, boost=0.0):
+        slot = len(self.entries)
+        tags = frozenset(t.lower() for t in entry.get("tags", []))
+        self.entries.append(entry)
+        self.names.append(entry["name"])
+        self.classes.append(entry.get("class"))
+        self.tags_lower.append(tags)
+        self.masks.append(self.tag_mask(tags, create=True))
+        self.base.append(self._static_weight(entry.get("class"), boost))
+        self._by_name.setdefault(entry["name"], []).append(slot)
+        for zone in (entry["zone"], ALL):
+            members = self._members.setdefault(zone, [])
+            self._local[(zone, slot)] = len(members)
+            members.append(slot)
+            key = (zone, entry.get("class"))
+            self._class_mass[key] = self._class_mass.get(key, 0.0) + self.base[slot]
+            self._trees.pop(zone, None)
+        return slot
+
+    @staticmethod
+    def _static_weight(klass, boost):
+        w = 1.0 + boost
+        if klass == "generic":
+            w *= GENERIC_FACTOR
+        return max(0.0, w)
+
+    def tag_mask(self, tags, create=False):
+        mask = 0
+        for t in tags:
+            bit = self._tag_bits.get(t)
+            if bit is None:
+                if not create:
+                    continue
+                bit = self._tag_bits[t] = 1 << len(self._tag_bits)
+            mask |= bit
+        return mask
+
+    def has_zone(self, zone):
+        return bool(self._members.get(zone))
+
+    def members(self, zone):
+        return self._members.get(zone, [])
+
+    def slots_for(self, name):
+        return self._by_name.get(name, [])
+
+    def set_boost(self, name, boost):
+        """Re-weight every pattern with this name; O(log n) per tree it lives in."""
+        for slot in self._by_name.get(name, []):
+            new = self._static_weight(self.classes[slot], boost)
+            delta = new - self.base[slot]
+            if not delta:
+                continue
+            self.base[slot] = new
+            for zone in (self.entries[slot]["zone"], ALL):
+                key = (zone, self.classes[slot])
+                self._class_mass[key] = self._class_mass.get(key, 0.0) + delta
+                tree = self._trees.get(zone)
+                if tree is not None:
+                    tree.add(self._local[(zone, slot)], delta)
+
+    def _tree(self, zone):
+        tree = self._trees.get(zone)
+        if tree is None:
+            tree = self._trees[zone] = FenwickTree([self.base[s] for s in self._members.get(zone, [])])
+        return tree
+
+    def avoided_mass(self, zone, avoid_names, avoid_classes):
+        mass = sum(self._class_mass.get((zone, c), 0.0) for c in avoid_classes)
+        for name in avoid_names:
+            for slot in self._by_name.get(name, []):
+                in_zone = zone == ALL or self.entries[slot]["zone"] == zone
+                if in_zone and self.classes[slot] not in avoid_classes:
+                    mass += self.base[slot]
+        return mass
+
+    def sample(self, zone, query_factor, avoid_names=(), avoid_classes=(), max_tries=32, rng=random):
+        """
+        Draw a slot with probability proportional to base[slot] * query_factor(slot).
+        query_factor must return 0 for excluded slots and never exceed QUERY_FACTOR_MAX.
+        Returns None when sampling would be inefficient or keeps missing; callers then fall back to a full scan.
+        """
+        tree = self._tree(zone)
+        total = tree.total
+        if total <= 0:
+            return None
+        if (avoid_names or avoid_classes) and self.avoided_mass(zone, avoid_names, avoid_classes) >= MAX_AVOIDED_MASS * total:
+            return None
+        members = self._members[zone]
+        for _ in range(max_tries):
+            slot = members[tree.find(rng.random() * tree.total)]
+            if rng.random() * QUERY_FACTOR_MAX < query_factor(slot):
+                return slot
+        return None
@@ -0,0 +1,172 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+class PatternStatsStore(threading.Thread):
+    """
+    Append-only JSONL log of pattern boosts and uses, so preference learning survives restarts.
+
+    Lines are {"b": name, "v": amount} (boost delta), {"u": name, "ts": time} (use), or a
+    {"snapshot": {...}} written by compaction. Everything happens on this thread: the file is
+    replayed once at startup (on_loaded receives the totals), then new events are appended every
+    flush_interval_s. When the log has grown well past one line per pattern it is compacted into a
+    single snapshot line, so years of usage stay a small file.
+    """
+
+    def __init__(self, path, on_loaded=None, flush_interval_s=5.0, compact_min_lines=1000, compact_ratio=4):
+        super().__init__(daemon=True, name="PatternStatsStore")
+        self.path = Path(path)
+        self._on_loaded = on_loaded
+        self.flush_interval_s = flush_interval_s
+        self.compact_min_lines = compact_min_lines
+        self.compact_ratio = compact_ratio
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # the thread's last flush and a caller's flush() on exit can overlap
+        self._pending = []
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self.loaded = threading.Event()
+
+        # Totals as of the last flush (file contents replayed, plus everything appended since)
+        self.weights = {}
+        self.last_used = {}
+        self.uses = {}
+        self._lines = 0
+
+        # Metrics
+        self.flushes = 0
+        self.compactions = 0
+        self.load_s = 0.0
+
+    # ---- called from request / mode threads; never touch the disk ----
+    def record_boost(self, name, amount):
+        with self._lock:
+            self._pending.append({"b": name, "v": float(amount)})
+
+    def record_use(self, name, ts=None):
+        with self._lock:
+            self._pending.append({"u": name, "ts": round(ts if ts is not None else time.time(), 3)})
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def flush(self, timeout=5.0):
+        """Append pending events now, in the caller's thread (e.g. on exit, after stop())."""
+        # Appending before the replay finishes would count this session's events twice
+        if self.loaded.wait(timeout):
+            self._flush()
+
+    # ---- background work ----
+    def run(self):
+        self._load()
+        while not self._stop_event.is_set():
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            self._flush()
+
+    def _apply(self, rec):
+        if "b" in rec:
+            self.weights[rec["b"]] = self.weights.get(rec["b"], 0.0) + float(rec.get("v", 0.0))
+        elif "u" in rec:
+            name = rec["u"]
+            self.last_used[name] = max(self.last_used.get(name, 0.0), float(rec.get("ts", 0.0)))
+            self.uses[name] = self.uses.get(name, 0) + 1
+        elif "snapshot" in rec:
+            snap = rec["snapshot"]
+            self.weights = {k: float(v) for k, v in snap.get("weights", {}).items()}
+            self.last_used = {k: float(v) for k, v in snap.get("last_used", {}).items()}
+            self.uses = {k: int(v) for k, v in snap.get("uses", {}).items()}
+
+    def _load(self):
+        start = time.monotonic()
+        try:
+            data = self.path.read_bytes()
+            for line in data.splitlines():
+                self._lines += 1
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, TypeError, AttributeError):
+                    continue  # torn last line from a crash, or junk
+            self._repair_tail(data)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Could not read pattern stats from {self.path}: {e}")
+        self.load_s = time.monotonic() - start
+        self.loaded.set()
+        if self._on_loaded:
+            try:
+                self._on_loaded(dict(self.weights), dict(self.last_used))
+            except Exception as e:
+                print(f"Applying saved pattern stats failed: {e}")
+
+    def _repair_tail(self, data):
+        """Make sure the next append starts on a fresh line: drop a torn last line, or terminate a whole one."""
+        if not data or data.endswith(b"\n"):
+            return
+        tail = data[data.rfind(b"\n") + 1:]
+        with open(self.path, "rb+") as f:
+            try:
+                json.loads(tail)
+            except ValueError:
+                f.truncate(len(data) - len(tail))
+            else:
+                f.seek(0, os.SEEK_END)
+                f.write(b"\n")
+
+    def _flush(self):
+        with self._flush_lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(rec, separators=(",", ":")) + "\n" for rec in pending))
+        except OSError as e:
+            print(f"Could not save pattern stats to {self.path}: {e}")
+            with self._lock:
+                self._pending[:0] = pending
+            return
+        for rec in pending:
+            self._apply(rec)
+        self._lines += len(pending)
+        self.flushes += 1
+        live = len(set(self.weights) | set(self.last_used))
+        if self._lines > max(self.compact_min_lines, self.compact_ratio * live):
+            self._compact()
+
+    def _compact(self):
+        snap = {"snapshot": {"weights": self.weights, "last_used": self.last_used, "uses": self.uses}}
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps(snap, separators=(",", ":")) + "\n")
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"Pattern stats compaction failed: {e}")
+            return
+        self._lines = 1
+        self.compactions += 1
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "loaded": self.loaded.is_set(),
+            "patterns": len(set(self.weights) | set(self.last_used)),
+            "log_lines": self._lines,
+            "pending": pending,
+            "flushes": self.flushes,
+            "compactions": self.compactions,
+            "load_s": round(self.load_s, 3),
+        }
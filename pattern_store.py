@@ -0,0 +1,172 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+
+# Binary cache layout (native byte order, recorded in the header):
+#   header: MAGIC, version u32, byte order (b"<" or b">"), meta_len u64
+#   meta:   UTF-8 JSON {"sources": {relpath: [size, mtime_ns]}, "patterns": [[name, tags, zone, offset, count], ...]}
+#   data:   int32 words, 8-byte aligned; pattern i stores count 'at' values then count 'pos' values from offset
+MAGIC = b"SGPL"
+VERSION = 1
+_HEADER = struct.Struct("<4sIcxxxQ")
+_BYTE_ORDER = b"<" if sys.byteorder == "little" else b">"
+PACK_SUFFIXES = (".json", ".funscript")
+
+class StoredPattern(dict):
+    """Pattern dict backed by a PatternStore slot; index entries carry no actions until materialized."""
+    slot = None
+
+def _actions(raw):
+    acts = []
+    for a in raw or []:
+        try:
+            acts.append((int(round(float(a.get("at", 0)))), int(round(float(a.get("pos", 50))))))
+        except (TypeError, ValueError, AttributeError):
+            continue
+    acts.sort(key=lambda x: x[0])
+    return acts
+
+def _patterns_in_file(path):
+    """Yield (name, tags, zone, actions) from a library JSON (name -> pattern), a single-pattern JSON or a funscript."""
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(data, dict):
+        return
+    if isinstance(data.get("actions"), list):
+        meta = data.get("metadata") or {}
+        name = data.get("name") or meta.get("title") or path.stem
+        yield name, list(data.get("tags") or meta.get("tags") or []), data.get("zone"), _actions(data["actions"])
+        return
+    for key, pat in data.items():
+        if isinstance(pat, dict) and pat.get("actions"):
+            yield pat.get("name") or key, list(pat.get("tags") or []), pat.get("zone"), _actions(pat["actions"])
+
+def source_files(source):
+    source = Path(source)
+    if source.is_dir():
+        return sorted(p for p in source.rglob("*") if p.is_file() and p.suffix.lower() in PACK_SUFFIXES)
+    return [source]
+
+def cache_path_for(source):
+    source = Path(source)
+    if source.is_dir():
+        return source / ".pattern_cache.bin"
+    return source.with_name(f".{source.name}.cache")
+
+def _fingerprint(source, files):
+    root = Path(source) if Path(source).is_dir() else Path(source).parent
+    out = {}
+    for f in files:
+        st = f.stat()
+        out[str(f.relative_to(root))] = [st.st_size, st.st_mtime_ns]
+    return out
+
+class PatternStore:
+    """
+    Read-only, memory-mapped pattern actions for one library source (a JSON file or a directory of packs).
+    The cache is rebuilt whenever a source file's size or mtime changes; otherwise startup only parses the
+    metadata index, and actions are read from the map when a pattern is materialized.
+    """
+
+    def __init__(self, source, cache_path=None):
+        self.source = Path(source)
+        self.cache_path = Path(cache_path) if cache_path else cache_path_for(self.source)
+        self.patterns = []  # [name, tags, zone, offset, count]
+        self._mm = None
+        self._words = None
+        self.rebuilt = False
+        self._open()
+
+    def _open(self):
+        files = source_files(self.source)
+        fingerprint = _fingerprint(self.source, files)
+        if not self._load(fingerprint):
+            self._build(files, fingerprint)
+            self.rebuilt = True
+            if not self._load(fingerprint):
+                raise OSError(f"Pattern cache at {self.cache_path} could not be read back")
+
+    def _load(self, fingerprint):
+        try:
+            with open(self.cache_path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        try:
+            magic, version, order, meta_len = _HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or version != VERSION or order != _BYTE_ORDER:
+                raise ValueError("stale format")
+            meta = json.loads(bytes(mm[_HEADER.size:_HEADER.size + meta_len]).decode("utf-8"))
+            if meta.get("sources") != fingerprint:
+                raise ValueError("sources changed")
+        except (ValueError, struct.error, UnicodeDecodeError):
+            mm.close()
+            return False
+        data_start = _aligned(_HEADER.size + meta_len)
+        self.patterns = meta["patterns"]
+        self._mm = mm
+        self._words = memoryview(mm)[data_start:].cast("i")
+        return True
+
+    def _build(self, files, fingerprint):
+        patterns, words = [], array("i")
+        for path in files:
+            try:
+                found = list(_patterns_in_file(path))
+            except (OSError, ValueError) as e:
+                print(f"Skipping pattern pack {path}: {e}")
+                continue
+            for name, tags, zone, acts in found:
+                if not acts:
+                    continue
+                patterns.append([name, tags, zone, len(words), len(acts)])
+                words.extend(a[0] for a in acts)
+                words.extend(a[1] for a in acts)
+        meta = json.dumps({"sources": fingerprint, "patterns": patterns}, separators=(",", ":")).encode("utf-8")
+        header = _HEADER.pack(MAGIC, VERSION, _BYTE_ORDER, len(meta))
+        padding = b"\0" * (_aligned(_HEADER.size + len(meta)) - _HEADER.size - len(meta))
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header + meta + padding)
+                words.tofile(f)
+            os.replace(tmp, self.cache_path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def raw_actions(self, slot):
+        """(at, pos) int32 views straight from the map; no copy. Views must not outlive close()."""
+        if self._mm is None:
+            raise ValueError(f"Pattern store for {self.source} is closed")
+        _, _, _, offset, count = self.patterns[slot]
+        return self._words[offset:offset + count], self._words[offset + count:offset + 2 * count]
+
+    def actions(self, slot):
+        at, pos = self.raw_actions(slot)
+        return [{"at": float(t), "pos": float(p)} for t, p in zip(at.tolist(), pos.tolist())]
+
+    @property
+    def closed(self):
+        return self._mm is None
+
+    def close(self):
+        if self._mm is not None:
+            self._words.release()
+            self._words = None
+            self._mm.close()
+            self._mm = None
+
+def _aligned(n, to=8):
+    return (n + to - 1) // to * to
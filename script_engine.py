@@ -1,7 +1,14 @@
 import json
+import math
 import random
+import threading
+import time
+from collections import OrderedDict
 from llm_service import LLMService
 
+# Intents are bucketed to this many percent before cache lookup, so near-identical moves share scripts
+CACHE_BUCKET_PCT = 10
+
 class Intent:
     def __init__(self, speed_pct=50, depth_center_pct=50, range_pct=50, tags=None):
         self.speed_pct = max(0.0, min(100.0, float(speed_pct if speed_pct is not None else 50)))
@@ -9,10 +16,159 @@ class Intent:
         self.range_pct = max(0.0, min(100.0, float(range_pct if range_pct is not None else 50)))
         self.tags = set(tags or [])
 
+def _clamp(v, lo, hi):
+    return max(lo, min(hi, v))
+
+def _copy_script(script):
+    # Callers mutate actions in place (pos -> pos_pct), so never hand out the cached dicts
+    return {**script, 'actions': [dict(a) for a in script['actions']]}
+
 class ScriptEngine:
-    def __init__(self, llm: LLMService):
+    def __init__(self, llm: LLMService = None, cache_size=64, cache_ttl_s=900.0, cache_variants=3):
         self.llm = llm
 
+        # LRU of generated scripts: key -> {'created', 'variants', 'next'}
+        self.cache_size = max(0, int(cache_size))
+        self.cache_ttl_s = cache_ttl_s
+        self.cache_variants = max(1, int(cache_variants))
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._filling = set()  # keys with a background variant generation running
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._generation_count = 0
+        self._generation_total_s = 0.0
+        self.latency_saved_s = 0.0
+
+    def _cache_key(self, intent: Intent, min_depth: float, max_depth: float):
+        def bucket(v):
+            return int(round(v / CACHE_BUCKET_PCT))
+        tags = frozenset(str(t).lower() for t in intent.tags)
+        return (bucket(intent.speed_pct), bucket(intent.depth_center_pct), bucket(intent.range_pct),
+                tags, int(round(min_depth)), int(round(max_depth)))
+
+    def _cache_lookup(self, key):
+        """
+        Return (variant, wants_more): the next cached variant (None on a miss), and whether the key
+        should get another variant generated in the background (it has some, but not a full set yet).
+        """
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None, False
+            if self.cache_ttl_s and time.monotonic() - entry['created'] > self.cache_ttl_s:
+                del self._cache[key]
+                return None, False
+            self._cache.move_to_end(key)
+            script = entry['variants'][entry['next'] % len(entry['variants'])]
+            entry['next'] += 1
+            wants_more = len(entry['variants']) < self.cache_variants and key not in self._filling
+            if wants_more:
+                self._filling.add(key)
+            return _copy_script(script), wants_more
+
+    def _fill_variant(self, key, intent: Intent, min_depth: float, max_depth: float):
+        """Background: generate one more variant for a key that is already being served from cache."""
+        try:
+            self._generate_and_store(key, intent, min_depth, max_depth)
+        finally:
+            with self._cache_lock:
+                self._filling.discard(key)
+
+    def _cache_store(self, key, script):
+        if not self.cache_size:
+            return
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                entry = {'created': time.monotonic(), 'variants': [], 'next': 0}
+                self._cache[key] = entry
+            if len(entry['variants']) < self.cache_variants:
+                entry['variants'].append(_copy_script(script))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def cache_stats(self):
+        lookups = self.cache_hits + self.cache_misses
+        with self._cache_lock:
+            entries = len(self._cache)
+        return {
+            "entries": entries,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+            "avg_generation_s": round(self._generation_total_s / self._generation_count, 3) if self._generation_count else 0.0,
+            "latency_saved_s": round(self.latency_saved_s, 2),
+        }
+
+    def generate_procedural_script(self, intent: Intent, min_depth: float, max_depth: float,
+                                   duration_s: float = None, seed=None) -> dict:
+        """
+        Build a script locally from the intent, with no LLM round trip.
+        Same inputs and seed always give the same script. Tags follow the LLM prompt's vocabulary:
+        'tip'/'base' shift the stroke toward an end, 'piston' is hard up/down, 'grind' is tight and quick.
+        """
+        if seed is None:
+            seed = f"{intent.speed_pct}:{intent.depth_center_pct}:{intent.range_pct}:{sorted(intent.tags)}"
+        rnd = random.Random(str(seed))
+        if duration_s is None:
+            duration_s = rnd.uniform(4.0, 7.0)
+
+        lo, hi = sorted((float(min_depth), float(max_depth)))
+        span = max(1.0, hi - lo)
+        tags = {str(t).lower() for t in intent.tags}
+        grind = "grind" in tags
+
+        half = span * intent.range_pct / 200.0
+        if grind:
+            half *= 0.35
+        half = _clamp(half, 1.0, span / 2.0)
+
+        if "tip" in tags:
+            center = hi - half
+        elif tags & {"base", "deep"}:
+            center = lo + half
+        else:
+            center = lo + span * intent.depth_center_pct / 100.0
+        center = _clamp(center, lo + half, hi - half)
+
+        # One full up/down stroke takes 2.0 s at 0% speed down to 0.3 s at 100%
+        period_ms = (2.0 - 1.7 * intent.speed_pct / 100.0) * 1000.0
+        if grind:
+            period_ms *= 0.6
+        # Points per stroke: hard reversals for piston, a sampled wave otherwise
+        points_per_stroke = 2 if "piston" in tags else (6 if grind else 4)
+        step_ms = period_ms / points_per_stroke
+
+        # Whole strokes only, ending one step before the start position, so the loop seam is just another step
+        strokes = max(1, int(round(duration_s * 1000.0 / period_ms)))
+        actions = []
+        at = 0.0
+        amp = half
+        for i in range(strokes * points_per_stroke):
+            phase = (i % points_per_stroke) / points_per_stroke
+            if i % points_per_stroke == 0:
+                # Vary each stroke slightly so loops don't feel mechanical
+                amp = half * rnd.uniform(0.9, 1.0)
+            if points_per_stroke == 2:
+                offset = amp if phase == 0 else -amp
+            else:
+                offset = amp * math.cos(2.0 * math.pi * phase)
+            actions.append({"at": int(round(at)), "pos": int(round(_clamp(center + offset, lo, hi)))})
+            at += step_ms * rnd.uniform(0.95, 1.05)
+
+        return {
+            'name': 'procedural',
+            'actions': actions,
+            # The next loop's first point is due where this script's next point would have been
+            'duration_ms': int(round(at))
+        }
+
     def _build_generation_prompt(self, intent: Intent, min_depth: float, max_depth: float) -> str:
         duration_s = random.uniform(4.0, 7.0)
         
@@ -41,6 +197,32 @@ class ScriptEngine:
         )
 
     def generate_script(self, intent: Intent, context: dict, min_depth: float, max_depth: float) -> dict | None:
+        if not self.llm:
+            return None
+
+        key = self._cache_key(intent, min_depth, max_depth)
+        cached, wants_more = self._cache_lookup(key)
+        if cached is not None:
+            self.cache_hits += 1
+            if self._generation_count:
+                self.latency_saved_s += self._generation_total_s / self._generation_count
+            if wants_more:
+                threading.Thread(target=self._fill_variant, args=(key, intent, min_depth, max_depth),
+                                 daemon=True, name="ScriptVariantFill").start()
+            return cached
+        self.cache_misses += 1
+        return self._generate_and_store(key, intent, min_depth, max_depth)
+
+    def _generate_and_store(self, key, intent: Intent, min_depth: float, max_depth: float) -> dict | None:
+        started = time.monotonic()
+        script = self._generate_uncached(intent, min_depth, max_depth)
+        if script is not None:
+            self._generation_count += 1
+            self._generation_total_s += time.monotonic() - started
+            self._cache_store(key, script)
+        return script
+
+    def _generate_uncached(self, intent: Intent, min_depth: float, max_depth: float) -> dict | None:
         prompt = self._build_generation_prompt(intent, min_depth, max_depth)
         
         try:
@@ -1,10 +1,23 @@
 import json
 import random
+import threading
 import time
 from pathlib import Path
 
+from pattern_index import PatternIndex, PREFERRED_BONUS, ALL
+from pattern_stats_store import PatternStatsStore
+from pattern_store import PatternStore, StoredPattern
+
+try:
+    import numpy as np
+except ImportError:  # optional: scale_to_user falls back to the pure-Python path
+    np = None
+
 # Convention reminder: 0 = base/deep, 100 = tip.
 
+# Below this many actions NumPy's per-call overhead outweighs the vectorized math
+VECTORIZE_MIN_ACTIONS = 24
+
 RHYTHM_CLASSES = [
     ("wave", {"wave", "sine", "resonance"}),
     ("pecks", {"pecks", "peck", "micro"}),
@@ -31,16 +44,31 @@ def _infer_class(tags):
     return "generic"
 
 class ScriptLibrary:
-    def __init__(self, possible_paths):
+    def __init__(self, possible_paths, stats_path=None):
         self._patterns = []
         self._by_zone = {"tip": [], "mid": [], "base": [], "deep": [], "full": []}
         self._weights = {}      # name -> boost
         self._last_used = {}    # name -> timestamp
+        self._arrays = {}       # id(entry) -> (entry, at, pos) for library patterns, when NumPy is available
+        self._index = PatternIndex()
+        self._store = None      # PatternStore when the library comes from the binary cache
+        self._weights_lock = threading.Lock()
         self._load_first_existing(possible_paths)
+        # Boosts and last-used times persist across sessions; the saved log is replayed in the background
+        self.stats_store = None
+        if stats_path:
+            self.stats_store = PatternStatsStore(stats_path, on_loaded=self._merge_saved_stats)
+            self.stats_store.start()
 
     def _load_first_existing(self, paths):
+        # Each path may be a library JSON file or a directory of JSON/funscript packs
         for p in paths:
             if p and Path(p).exists():
+                try:
+                    self._attach_store(PatternStore(p))
+                    return
+                except Exception as e:
+                    print(f"Pattern cache unavailable for {p} ({e}); loading it in memory.")
                 try:
                     data = json.loads(Path(p).read_text(encoding="utf-8"))
                     self._ingest(data)
@@ -49,6 +77,24 @@ class ScriptLibrary:
                     continue
         # No file found => empty bank; fallback moves will be used.
 
+    def _attach_store(self, store):
+        """Index the store's metadata only; actions stay in the memory map until a pattern is selected."""
+        self._store = store
+        for slot, (name, tags, zone, _, _) in enumerate(store.patterns):
+            entry = StoredPattern(name=name, tags=tags, zone=zone or self._guess_zone(name, tags))
+            entry["class"] = _infer_class(tags)
+            entry.slot = slot
+            self._patterns.append(entry)
+            self._by_zone.setdefault(entry["zone"], []).append(entry)
+            self._index.add(entry, self._weights.get(name, 0.0))
+
+    def _materialize(self, entry):
+        if "actions" in entry or self._store is None:
+            return entry
+        pat = StoredPattern(entry, actions=self._store.actions(entry.slot))
+        pat.slot = entry.slot
+        return pat
+
     def _guess_zone(self, name, tags):
         n = (name or "").lower()
         t = [s.lower() for s in (tags or [])]
@@ -86,6 +132,25 @@ class ScriptLibrary:
             }
             self._patterns.append(entry)
             self._by_zone.setdefault(zone, []).append(entry)
+            self._index.add(entry, self._weights.get(name, 0.0))
+            if np is not None:
+                self._arrays[id(entry)] = (entry,) + self._to_arrays(entry["actions"])
+
+    @staticmethod
+    def _to_arrays(actions):
+        at = np.fromiter((a["at"] for a in actions), dtype=np.float64, count=len(actions))
+        pos = np.fromiter((a["pos"] for a in actions), dtype=np.float64, count=len(actions))
+        return at, pos
+
+    def _action_arrays(self, pat):
+        cached = self._arrays.get(id(pat))
+        if cached and cached[0] is pat:
+            return cached[1], cached[2]
+        if isinstance(pat, StoredPattern) and pat.slot is not None and self._store is not None:
+            # Read the packed ints straight from the map instead of re-walking the action dicts
+            at, pos = self._store.raw_actions(pat.slot)
+            return np.frombuffer(at, dtype=np.intc).astype(np.float64), np.frombuffer(pos, dtype=np.intc).astype(np.float64)
+        return self._to_arrays(pat["actions"])
 
     # ---------- Public API ----------
     def select(self, zone: str, avoid_names=None, avoid_classes=None, recent_seconds: float = 60.0,
@@ -100,53 +165,86 @@ class ScriptLibrary:
             # If full not permitted, degrade to 'mid'
             zone = "mid"
 
-        bank = list(self._by_zone.get(zone, [])) or list(self._patterns)
-        if not bank:
+        idx = self._index
+        bank = zone if idx.has_zone(zone) else ALL
+        if not idx.has_zone(bank):
             return None
 
+        # Static weight ((1 + boost) x 0.85 for generic) lives in the index; these are the per-call factors
         now = time.time()
-        scored = []
-        for p in bank:
-            if p["name"] in avoid_names:
-                continue
-            if p.get("class") in avoid_classes:
-                continue
-
-            w = 1.0 + self._weights.get(p["name"], 0.0)
+        preferred_mask = idx.tag_mask(preferred_tags)
 
+        def query_factor(slot):
+            name = idx.names[slot]
+            if name in avoid_names or idx.classes[slot] in avoid_classes:
+                return 0.0
+            f = 1.0
             # novelty penalty if used recently
-            last = self._last_used.get(p["name"], 0.0)
+            last = self._last_used.get(name, 0.0)
             if last and now - last < recent_seconds:
                 # linear penalty down to 0.25x
-                w *= max(0.25, (now - last) / recent_seconds)
-
+                f *= max(0.25, (now - last) / recent_seconds)
             # small bonus for preferred tags
-            tags_lower = {t.lower() for t in p.get("tags", [])}
-            if preferred_tags and tags_lower.intersection(preferred_tags):
-                w *= 1.35
-
-            # avoid too generic when we have better
-            if p.get("class") == "generic":
-                w *= 0.85
-
-            scored.append((w, p))
+            if preferred_mask and idx.masks[slot] & preferred_mask:
+                f *= PREFERRED_BONUS
+            return f
+
+        slot = idx.sample(bank, query_factor, avoid_names, avoid_classes)
+        if slot is None:
+            slot = self._select_scan(bank, query_factor)
+        return self._materialize(idx.entries[slot])
+
+    def _select_scan(self, bank, query_factor):
+        """Exact O(n) weighted pick; used when avoid lists exclude most of the bank."""
+        idx = self._index
+        members = idx.members(bank)
+        scored = []
+        for slot in members:
+            f = query_factor(slot)
+            if f > 0:
+                scored.append((idx.base[slot] * f, slot))
 
         if not scored:
             # if we filtered too hard, ignore class avoidance and pick again
-            scored = [(1.0 + self._weights.get(p["name"], 0.0), p) for p in bank]
+            scored = [(1.0 + self._weights.get(idx.names[s], 0.0), s) for s in members]
 
-        weights, candidates = zip(*scored)
-        pick = random.choices(candidates, weights=weights, k=1)[0]
-        return pick
+        weights, slots = zip(*scored)
+        return random.choices(slots, weights=weights, k=1)[0]
 
     def boost_pattern(self, name: str, amount: float = 1.0):
         if not name:
             return
-        self._weights[name] = self._weights.get(name, 0.0) + float(amount)
+        with self._weights_lock:
+            self._weights[name] = self._weights.get(name, 0.0) + float(amount)
+            self._index.set_boost(name, self._weights[name])
+        if self.stats_store:
+            self.stats_store.record_boost(name, amount)
 
     def mark_used(self, name: str):
         if name:
-            self._last_used[name] = time.time()
+            now = time.time()
+            self._last_used[name] = now
+            if self.stats_store:
+                self.stats_store.record_use(name, now)
+
+    def _merge_saved_stats(self, weights, last_used):
+        # Runs on the stats thread once the log is replayed; anything from this session stacks on top
+        with self._weights_lock:
+            for name, boost in weights.items():
+                if boost:
+                    self._weights[name] = self._weights.get(name, 0.0) + boost
+                    self._index.set_boost(name, self._weights[name])
+        for name, ts in last_used.items():
+            if ts > self._last_used.get(name, 0.0):
+                self._last_used[name] = ts
+
+    def close(self):
+        """Write out pending boosts/uses and release the pattern cache map (called on exit)."""
+        if self.stats_store:
+            self.stats_store.stop()
+            self.stats_store.flush()
+        if self._store is not None:
+            self._store.close()
 
     def _pattern_length_ms(self, pat):
         acts = pat["actions"]
@@ -169,14 +267,6 @@ class ScriptLibrary:
             return self._fallback_steps(zone, lo, hi, target_seconds)
 
         actions = pat["actions"]
-        # --- FIX: Invert the position values to match the application's coordinate system (0=base, 100=tip) ---
-        vals = [(100 - a["pos"]) for a in actions]
-        # -----------------------------------------------------------------------------------------------------
-        vmin, vmax = min(vals), max(vals)
-        span_src = max(1e-6, vmax - vmin)
-        # normalized around 0: roughly in [-1,1]
-        norm = [((v - (vmin + vmax) / 2.0) / (span_src / 2.0)) for v in vals]
-
         orig_ms = max(1.0, self._pattern_length_ms(pat))
         factor = (target_seconds * 1000.0) / orig_ms
 
@@ -199,7 +289,31 @@ class ScriptLibrary:
         }
         center = centers.get((zone or "mid").lower(), (lo + hi) / 2.0)
 
-        steps = []
+        # Both paths give identical steps for a given seed; the vectorized one just gets there faster
+        shape = (pat, rng, center, cap, usable, lo, hi, factor, jitter_dp_frac, jitter_rng_frac)
+        if np is not None and len(actions) >= VECTORIZE_MIN_ACTIONS:
+            columns = self._shape_steps_np(*shape)
+        else:
+            columns = self._shape_steps_py(*shape)
+        merged = self._merge_steps(*columns)
+
+        # mark last used
+        self.mark_used(pat.get("name"))
+
+        return merged
+
+    def _shape_steps_py(self, pat, rng, center, cap, usable, lo, hi, factor, jitter_dp_frac, jitter_rng_frac):
+        """Per-action stroke values as columns (sp, dp, rng, sleep)."""
+        actions = pat["actions"]
+        # --- FIX: Invert the position values to match the application's coordinate system (0=base, 100=tip) ---
+        vals = [(100 - a["pos"]) for a in actions]
+        # -----------------------------------------------------------------------------------------------------
+        vmin, vmax = min(vals), max(vals)
+        span_src = max(1e-6, vmax - vmin)
+        # normalized around 0: roughly in [-1,1]
+        norm = [((v - (vmin + vmax) / 2.0) / (span_src / 2.0)) for v in vals]
+
+        sps, dps, rngs, sleeps = [], [], [], []
         last_at = actions[0]["at"]
         for i, a in enumerate(actions):
             dp = center + norm[i] * (cap * 0.50)
@@ -219,30 +333,59 @@ class ScriptLibrary:
             last_at = a["at"]
             sp = 25.0 + min(75.0, 5000.0 / dt_ms)  # 25..100
 
-            steps.append({
-                "sp": int(round(sp)),
-                "dp": int(round(dp)),
-                "rng": int(round(rn)),
-                "sleep": dt_ms / 1000.0
-            })
-
-        # Merge near-duplicates to reduce spam commands
+            sps.append(int(round(sp)))
+            dps.append(int(round(dp)))
+            rngs.append(int(round(rn)))
+            sleeps.append(dt_ms / 1000.0)
+        return sps, dps, rngs, sleeps
+
+    def _shape_steps_np(self, pat, rng, center, cap, usable, lo, hi, factor, jitter_dp_frac, jitter_rng_frac):
+        """Vectorized _shape_steps_py. Same operation order, so the float results match bit for bit."""
+        at, pos = self._action_arrays(pat)
+        n = len(at)
+        vals = 100 - pos
+        vmin, vmax = vals.min(), vals.max()
+        span_src = max(1e-6, vmax - vmin)
+        norm = (vals - (vmin + vmax) / 2.0) / (span_src / 2.0)
+
+        # Jitter comes from the same random.Random stream, drawn in the same per-action order
+        n_draws = (jitter_dp_frac > 0) + (jitter_rng_frac > 0)
+        draws = np.array([rng.random() for _ in range(n * n_draws)], dtype=np.float64).reshape(n, n_draws)
+
+        dp = center + norm * (cap * 0.50)
+        if jitter_dp_frac > 0:
+            dp += (draws[:, 0] * 2 - 1) * (usable * jitter_dp_frac)
+        dp = np.maximum(lo, np.minimum(hi, dp))
+
+        delta = np.empty(n)
+        delta[0] = 0.0
+        np.abs(norm[1:] - norm[:-1], out=delta[1:])
+        rn = np.maximum(5.0, np.minimum(cap, (cap * 0.35) + delta * cap * 0.15))
+        if jitter_rng_frac > 0:
+            rn *= (1.0 + (draws[:, n_draws - 1] * 2 - 1) * jitter_rng_frac)
+            rn = np.maximum(5.0, np.minimum(cap, rn))
+
+        dt = np.empty(n)
+        dt[0] = 0.0
+        np.subtract(at[1:], at[:-1], out=dt[1:])
+        dt_ms = np.maximum(30.0, dt * factor)
+        sp = 25.0 + np.minimum(75.0, 5000.0 / dt_ms)
+
+        # np.rint rounds half to even, like round()
+        return (np.rint(sp).astype(np.int64).tolist(), np.rint(dp).astype(np.int64).tolist(),
+                np.rint(rn).astype(np.int64).tolist(), (dt_ms / 1000.0).tolist())
+
+    @staticmethod
+    def _merge_steps(sps, dps, rngs, sleeps):
+        """Merge near-duplicates to reduce spam commands."""
         merged = []
         acc = None
-        for st in steps:
-            if acc is None:
-                acc = dict(st)
+        for sp, dp, rn, sleep in zip(sps, dps, rngs, sleeps):
+            if acc is not None and sleep < 0.06 and abs(dp - acc["dp"]) < 2 and abs(rn - acc["rng"]) < 2:
+                acc["sleep"] += sleep
             else:
-                if st["sleep"] < 0.06 and abs(st["dp"] - acc["dp"]) < 2 and abs(st["rng"] - acc["rng"]) < 2:
-                    acc["sleep"] += st["sleep"]
-                else:
-                    merged.append(acc); acc = dict(st)
-        if acc:
-            merged.append(acc)
-
-        # mark last used
-        self.mark_used(pat.get("name"))
-
+                acc = {"sp": sp, "dp": dp, "rng": rn, "sleep": sleep}
+                merged.append(acc)
         return merged
 
     def _fallback_steps(self, zone, lo, hi, target_seconds):
@@ -1,6 +1,11 @@
 import threading
 import time
 import math
+from compiled_script import compile_script
+
+# The device acts on a command roughly half a round trip after we send it,
+# so actions are dispatched early by that much (capped so a bad link can't skew timing wildly).
+MAX_LEAD_S = 0.25
 
 class ScriptPlayer(threading.Thread):
     def __init__(self, handy_controller):
@@ -12,15 +17,57 @@ class ScriptPlayer(threading.Thread):
         self._current = None
         self._loop = True
 
+        # Lateness of each dispatched action against its scheduled time
+        self._late_count = 0
+        self._late_total_ms = 0.0
+        self._late_max_ms = 0.0
+        self._late_last_ms = 0.0
+
+    @property
+    def loop(self):
+        """Whether scripts repeat; HSSP uploads are set to loop the same way."""
+        return self._loop
+
+    @loop.setter
+    def loop(self, value):
+        self._loop = bool(value)
+
     def stop(self):
         self._stop_event.set()
         self._new_script_event.set()
 
     def set_script(self, script_dict):
+        # Compile once here; the playback loop only walks the precomputed arrays
+        compiled = compile_script(script_dict, self.handy.FULL_TRAVEL_MM, self.handy.current_max_velocity_mm_s)
         with self._lock:
-            self._current = script_dict
+            self._current = compiled
             self._new_script_event.set()
 
+    def _current_limits(self):
+        return self.handy.FULL_TRAVEL_MM, self.handy.current_max_velocity_mm_s
+
+    def _lead_s(self):
+        dispatcher = getattr(self.handy, "dispatcher", None)
+        if dispatcher is None:
+            return 0.0
+        return min(MAX_LEAD_S, dispatcher.avg_latency_ms / 2000.0)
+
+    def _record_lateness(self, late_s):
+        late_ms = max(0.0, late_s * 1000.0)
+        self._late_count += 1
+        self._late_total_ms += late_ms
+        self._late_last_ms = late_ms
+        self._late_max_ms = max(self._late_max_ms, late_ms)
+
+    def stats(self):
+        return {
+            "actions": self._late_count,
+            "late_mean_ms": round(self._late_total_ms / self._late_count, 2) if self._late_count else 0.0,
+            "late_max_ms": round(self._late_max_ms, 2),
+            "late_last_ms": round(self._late_last_ms, 2),
+            "lead_ms": round(self._lead_s() * 1000.0, 2),
+        }
+
     def run(self):
         while not self._stop_event.is_set():
             self._new_script_event.wait()
@@ -33,46 +80,28 @@ class ScriptPlayer(threading.Thread):
             if not script:
                 continue
 
+            # All timing is against one monotonic origin, so repeats don't accumulate drift
+            start = time.monotonic()
             while not self._stop_event.is_set():
-                start = time.perf_counter()
-                acts = script['actions']
-                for i in range(len(acts)):
-                    if self._stop_event.is_set() or self._new_script_event.is_set():
+                # Limits only change between moves; recompile lazily when they do
+                script = script.recompile(*self._current_limits())
+                for t_ms, mm, vel in zip(script.times_ms, script.target_mm, script.velocities):
+                    target_time = start + (t_ms / 1000.0) - self._lead_s()
+                    delay = target_time - time.monotonic()
+                    # Sleep exactly until the action is due; a new script or stop wakes us immediately
+                    if delay > 0 and self._new_script_event.wait(delay):
                         break
-                    a = acts[i]
-                    t_ms = a['at']
-                    target_pct = a['pos_pct']
-
-                    mm = (self.handy.FULL_TRAVEL_MM * target_pct) / 100.0
-                    
-                    if i < len(acts)-1:
-                        next_t = acts[i+1]['at']
-                        dt = max(0.01, (next_t - t_ms)/1000.0)
-                        next_mm = (self.handy.FULL_TRAVEL_MM * acts[i+1]['pos_pct']) / 100.0
-                        dist = abs(next_mm - mm)
-                        # Calculate the ideal velocity based on the script's timing
-                        ideal_vel = max(5.0, dist / dt)
-                        # Cap the velocity using the controller's current max speed setting
-                        vel = min(ideal_vel, self.handy.current_max_velocity_mm_s)
-                    else:
-                        vel = 60.0
-
-                    now = time.perf_counter()
-                    target_time = start + (t_ms / 1000.0)
-                    if target_time > now:
-                        # Replace blocking sleep with a responsive wait
-                        end_sleep = time.time() + (target_time - now)
-                        while time.time() < end_sleep and not self._new_script_event.is_set() and not self._stop_event.is_set():
-                            time.sleep(0.02)
-
                     if self._new_script_event.is_set() or self._stop_event.is_set():
                         break
 
-                    try:
-                        self.handy._send_command("hdsp/xava", {"position": mm, "velocity": vel, "stopOnTarget": False})
-                    except Exception:
-                        pass
+                    self._record_lateness(time.monotonic() - target_time)
+                    # Non-blocking: the dispatcher coalesces targets if the link falls behind
+                    self.handy.dispatcher.submit("hdsp/xava", {"position": mm, "velocity": vel, "stopOnTarget": False})
 
                 if self._new_script_event.is_set() or not self._loop:
                     break
-                time.sleep(0.01)
\ No newline at end of file
+                cycle_s = script.cycle_s
+                start += cycle_s
+                # After a long stall, restart the cycle now rather than replaying a whole cycle of missed points
+                if time.monotonic() - start > cycle_s:
+                    start = time.monotonic()
@@ -5,9 +5,24 @@ import base64
 from pathlib import Path
 from typing import Optional, Any, Dict
 
+from settings_sections import ColdSections
+from write_behind import WriteBehindSaver, atomic_write_text
+
+# Big, rarely changing sections live in their own files (see ColdSections) and load on first access
+COLD_SECTIONS = ("user_profile", "patterns", "rules")
+
+def _cold_section(name):
+    return property(lambda self: self._cold.get(name), lambda self, value: self._cold.set(name, value))
+
 class SettingsManager:
+    user_profile = _cold_section("user_profile")
+    patterns = _cold_section("patterns")
+    rules = _cold_section("rules")
+
     def __init__(self, settings_file_path: str = "my_settings.json"):
         self.settings_file = Path(settings_file_path)
+        # e.g. my_settings.json -> my_settings.d/user_profile.json
+        self._cold = ColdSections(self.settings_file.with_name(f"{self.settings_file.stem}.d"), COLD_SECTIONS)
 
 <<<<<<< HEAD
         # Default values
@@ -46,6 +61,8 @@ class SettingsManager:
         self.max_speed: float = 100
         self.min_depth: float = 0
         self.max_depth: float = 100
+        # Handy playback: "hdsp" streams each point, "hssp" uploads the script and lets the device play it
+        self.handy_playback_mode: str = "hdsp"
 
         # Timings
         self.auto_min_time: float = 4.0
@@ -71,6 +88,13 @@ class SettingsManager:
         self.user_content_root = Path("user_content")
         (self.user_content_root / "pfp").mkdir(parents=True, exist_ok=True)
 
+        # Everything assigned above is a default; from here on, assigning a cold section marks it dirty
+        self._cold.seal_defaults()
+        self._last_hot_text = None
+
+        # save() only marks settings dirty; bursts are coalesced and written off the request thread
+        self._saver = WriteBehindSaver(self._write_settings, name="SettingsSaver")
+
     # ---------- LOAD / SAVE ----------
     def load(self):
 <<<<<<< HEAD
@@ -149,12 +173,18 @@ class SettingsManager:
         self.handy_key = data.get("handy_key", self.handy_key)
         self.ai_name = data.get("ai_name", self.ai_name)
         self.persona_desc = data.get("persona_desc", self.persona_desc)
-        self.user_profile = data.get("user_profile", self.user_profile)
+
+        # Older files keep the cold sections inline; move them out on the next save
+        migrated = [name for name in COLD_SECTIONS if name in data and self._cold.adopt_legacy(name, data[name])]
+        if migrated:
+            self.save()
 
         self.min_speed = data.get("min_speed", self.min_speed)
         self.max_speed = data.get("max_speed", self.max_speed)
         self.min_depth = data.get("min_depth", self.min_depth)
         self.max_depth = data.get("max_depth", self.max_depth)
+        if data.get("handy_playback_mode") in ("hdsp", "hssp"):
+            self.handy_playback_mode = data["handy_playback_mode"]
 
         timings = data.get("timings", {})
         self.auto_min_time = data.get("auto_min_time", timings.get("auto_min", self.auto_min_time))
@@ -184,15 +214,30 @@ class SettingsManager:
                 pass
 
     def save(self, *_args, **_kwargs):
+        self._saver.request()
+
+    def flush(self):
+        """Write any pending changes now (called on shutdown)."""
+        self._saver.flush()
+
+    def mark_dirty(self, section: str):
+        """Call after editing user_profile/patterns/rules in place, then save()."""
+        self._cold.mark_dirty(section)
+
+    def save_stats(self):
+        return {**self._saver.stats(), "sections": self._cold.stats()}
+
+    def _write_settings(self):
+        self._cold.write_dirty()
         payload = {
             "handy_key": self.handy_key,
             "ai_name": self.ai_name,
             "persona_desc": self.persona_desc,
-            "user_profile": self.user_profile,
             "min_speed": self.min_speed,
             "max_speed": self.max_speed,
             "min_depth": self.min_depth,
             "max_depth": self.max_depth,
+            "handy_playback_mode": self.handy_playback_mode,
             "auto_min_time": self.auto_min_time,
             "auto_max_time": self.auto_max_time,
             "milking_min_time": self.milking_min_time,
@@ -202,12 +247,13 @@ class SettingsManager:
             "reply_length": self.reply_length,
             "elevenlabs_api_key": self.elevenlabs_api_key,
             "elevenlabs_voice_id": self.elevenlabs_voice_id,
-            "patterns": self.patterns,
-            "rules": self.rules,
             # store only a short relative path, never base64
             "profile_picture_path": self.profile_picture_path,
         }
-        self.settings_file.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        text = json.dumps(payload, ensure_ascii=False, indent=2)
+        if text != self._last_hot_text:
+            atomic_write_text(self.settings_file, text)
+            self._last_hot_text = text
 
     # ---------- PROFILE PICTURE HELPERS ----------
     def save_profile_picture_data_url(self, data_url: str) -> str:
@@ -0,0 +1,103 @@
+import copy
+import json
+import threading
+from pathlib import Path
+
+from write_behind import atomic_write_text
+
+class ColdSections:
+    """
+    Large, slowly changing settings (profile, patterns, rules) kept one JSON file per section,
+    next to the main settings file. A section is read on first access and written only when it
+    was assigned (or mark_dirty() was called) since the last write, so small config changes never
+    re-serialize them.
+
+    Values assigned before seal_defaults() are the defaults used when a section has no file yet.
+    """
+
+    def __init__(self, directory, names):
+        self.directory = Path(directory)
+        self.names = tuple(names)
+        self._lock = threading.RLock()
+        self._defaults = {}
+        self._values = {}
+        self._dirty = set()
+        self._sealed = False
+
+        # Metrics
+        self.loads = 0
+        self.writes = {name: 0 for name in self.names}
+
+    def path(self, name):
+        return self.directory / f"{name}.json"
+
+    def seal_defaults(self):
+        self._sealed = True
+
+    def get(self, name):
+        with self._lock:
+            if name not in self._values:
+                self._values[name] = self._read(name)
+            return self._values[name]
+
+    def _read(self, name):
+        path = self.path(name)
+        if path.exists():
+            try:
+                self.loads += 1
+                return json.loads(path.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"Couldn't read settings section {path}, using defaults. Error: {e}")
+        return copy.deepcopy(self._defaults.get(name))
+
+    def set(self, name, value):
+        with self._lock:
+            if not self._sealed:
+                self._defaults[name] = value
+                return
+            self._values[name] = value
+            self._dirty.add(name)
+
+    def mark_dirty(self, name):
+        """For in-place edits of a section (assignment marks it dirty already)."""
+        with self._lock:
+            if name in self._values:
+                self._dirty.add(name)
+
+    def adopt_legacy(self, name, value):
+        """Take a section found in an old single-file settings JSON, unless it was already split out."""
+        if self.path(name).exists():
+            return False
+        self.set(name, value)
+        return True
+
+    @property
+    def dirty(self):
+        with self._lock:
+            return set(self._dirty)
+
+    def write_dirty(self):
+        """Write every changed section; returns the names written."""
+        with self._lock:
+            pending = {name: self._values[name] for name in self._dirty}
+            self._dirty.clear()
+        written = []
+        for name, value in pending.items():
+            try:
+                atomic_write_text(self.path(name), json.dumps(value, ensure_ascii=False))
+            except Exception:
+                with self._lock:
+                    self._dirty.update(n for n in pending if n not in written)
+                raise
+            self.writes[name] += 1
+            written.append(name)
+        return written
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": sorted(self._values),
+                "dirty": sorted(self._dirty),
+                "file_loads": self.loads,
+                "writes": dict(self.writes),
+            }
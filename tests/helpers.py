@@ -0,0 +1,53 @@
+"""
+Shared test helpers: polling for background threads, and fakes reused across test modules.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from buttplug.messages import v0
+
+
+def wait_until(predicate, timeout=2.0, interval=0.005):
+    """Poll predicate() until it is true or timeout passes; returns its last value."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() >= deadline:
+            return predicate()
+        time.sleep(interval)
+    return True
+
+
+class FakeButtplugDevice:
+    """Records every message (and its loop time) and acks it after delay_s, or answers with reply(message)."""
+
+    def __init__(self, index=0, delay_s=0.0, reply=None):
+        self.index = index
+        self.logger = logging.getLogger("fake-device")
+        self.sent = []
+        self.sent_at = []
+        self._delay_s = delay_s
+        self._reply = reply
+
+    async def send(self, message):
+        self.sent.append(message)
+        self.sent_at.append(asyncio.get_running_loop().time())
+        if self._delay_s:
+            await asyncio.sleep(self._delay_s)
+        return self._reply(message) if self._reply else v0.Ok(message.id)
+
+
+def write_pattern_packs(root):
+    """A pack directory with a library JSON, a funscript and an unreadable file; returns its path."""
+    (root / "packs").mkdir()
+    (root / "packs" / "library.json").write_text(json.dumps({
+        "Tip_Flick": {"tags": ["zone-tip", "pecks"], "actions": [{"at": 100, "pos": 90}, {"at": 0, "pos": 80}]},
+        "Empty": {"actions": []},
+    }))
+    (root / "packs" / "slow_wave.funscript").write_text(json.dumps({
+        "metadata": {"title": "Slow Wave", "tags": ["wave"]},
+        "actions": [{"at": 0, "pos": 10}, {"at": 500, "pos": 60}, {"at": 1000, "pos": 10}],
+    }))
+    (root / "packs" / "broken.json").write_text("{not json")
+    return root / "packs"
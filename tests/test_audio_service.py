@@ -0,0 +1,88 @@
+"""
+Unit tests for sentence-level streaming TTS in AudioService.
+"""
+import threading
+
+from audio_service import AudioService, AudioClip, split_sentences
+
+
+class _FakeTTS:
+    def __init__(self, fail_on=None):
+        self.texts = []
+        self.fail_on = fail_on
+
+    def convert(self, voice_id, text, model_id, voice_settings):
+        self.texts.append(text)
+        if text == self.fail_on:
+            raise RuntimeError("quota")
+        return iter([text.encode()[:4], text.encode()[4:]])
+
+
+class _FakeClient:
+    def __init__(self, tts):
+        self.text_to_speech = tts
+
+
+def _service(tts):
+    service = AudioService()
+    service.api_key, service.voice_id, service.is_on = "k", "v", True
+    service.client = _FakeClient(tts)
+    return service
+
+
+def test_split_sentences_merges_short_fragments():
+    text = "Hi. Oh! That feels so good, keep going. Slower now please, like that. Yes."
+    assert split_sentences(text) == [
+        "Hi. Oh! That feels so good, keep going.",
+        "Slower now please, like that. Yes.",
+    ]
+    assert split_sentences("") == []
+    assert split_sentences("Mr. Smith says hi, e.g. like this. Dr. J. Doe agrees completely.") == [
+        "Mr. Smith says hi, e.g. like this.",
+        "Dr. J. Doe agrees completely.",
+    ]
+
+
+def test_clip_chunks_are_readable_before_synthesis_finishes():
+    clip = AudioClip("x")
+    clip.add(b"ab")
+    it = clip.iter_chunks(timeout=1.0)
+    assert next(it) == b"ab"
+    threading.Timer(0.05, lambda: (clip.add(b"cd"), clip.finish())).start()
+    assert list(it) == [b"cd"]
+
+
+def test_generate_queues_one_clip_per_sentence_and_records_ttfa():
+    tts = _FakeTTS()
+    service = _service(tts)
+    ready = []
+    service.on_audio_ready = lambda clip: ready.append(clip.id)
+    service.generate_audio_for_text("First sentence is long enough. Second one is also long enough.")
+    assert len(tts.texts) == 2 and len(ready) == 2 and ready[0] != ready[1]
+    # Clips stay addressable by id, however often they are fetched
+    assert service.get_clip(ready[1]).read_all() == service.get_clip(ready[1]).read_all() != b""
+    assert service.get_next_audio_chunk() == b"First sentence is long enough."
+    assert service.stats()["ttfa_samples"] == 1
+
+
+def test_generate_stops_after_a_failed_sentence():
+    tts = _FakeTTS(fail_on="Second one is also long enough.")
+    service = _service(tts)
+    service.generate_audio_for_text("First sentence is long enough. Second one is also long enough. Third never gets spoken.")
+    assert len(tts.texts) == 2
+    assert service.get_next_audio_clip().read_all()
+    failed = service.get_next_audio_clip()
+    assert failed.read_all() == b"" and failed.error is not None
+    assert service.get_next_audio_clip() is None
+
+
+def test_cached_sentences_skip_the_api_and_warm_up_fills_cache(tmp_path):
+    from tts_cache import TTSCache
+    tts = _FakeTTS()
+    service = _service(tts)
+    service.tts_cache = TTSCache(tmp_path)
+    assert service.warm_up(["Okay, you're in control now.", "(not spoken)"]) == 1
+    service.generate_audio_for_text("Okay, you're in control now.")
+    assert len(tts.texts) == 1
+    assert service.get_next_audio_chunk() == b"Okay, you're in control now."
+    assert service.warm_up(["Okay, you're in control now."]) == 0
@@ -2,7 +2,7 @@
 Unit tests for ButtplugController using pytest.
 """
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 import asyncio
 
 # Import the ButtplugController
@@ -70,11 +70,18 @@ class TestButtplugController:
     def test_move_method_when_no_device(self, mock_run_coroutine_threadsafe):
         """Test move method when no device is connected."""
         controller = ButtplugController()
-        
+
+        # Construction schedules the movement loop and the script player on the controller's loop
+        background = [c.args[0] for c in mock_run_coroutine_threadsafe.call_args_list]
+        assert len(background) == 2
+        for coro in background:
+            coro.close()  # never run, since the call was mocked
+        mock_run_coroutine_threadsafe.reset_mock()
+
         # This should not raise an exception
         controller.move(speed=50, depth=50, stroke_range=50)
         
-        # Verify that run_coroutine_threadsafe was not called
+        # Verify that move() scheduled nothing
         mock_run_coroutine_threadsafe.assert_not_called()
     
     def test_try_use_device_with_vibrator_actuator(self):
@@ -121,6 +128,26 @@ class TestButtplugController:
         # A more comprehensive test would require proper async mocking
         assert callable(controller._try_use_device)
     
+    def test_rate_limit_gap_comes_from_the_server_device_list(self):
+        """The limiter gap is read from the DeviceList message, not from the library's Device internals."""
+        from buttplug.messages import v3
+
+        controller = ButtplugController()
+        mock_device = Mock()
+        mock_device.index = 4
+        mock_actuator = Mock()
+        mock_actuator.description = "Linear"
+        mock_actuator.index = 0
+        mock_device.actuators = [mock_actuator]
+        mock_device.linear_actuators = []
+        mock_device.rotatory_actuators = []
+        device_list = v3.DeviceList(1, [v3.Device("Stroker", 4, {}, device_message_timing_gap=60)])
+        controller.client = Mock()
+        controller.client.send = AsyncMock(return_value=device_list)
+
+        assert asyncio.run(controller._try_use_device(mock_device)) is True
+        assert controller.rate_limiter.min_gap_s == 0.06
+
     def test_try_use_device_with_rotatory_actuator(self):
         """Test _try_use_device method with a rotatory actuator."""
         controller = ButtplugController()
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+from buttplug.client.client import LinearActuator, ScalarActuator, VibrateActuator
+from buttplug.errors.server import DeviceServerError, ErrorCode
+from buttplug.messages import v0, v1, v3
+
+from buttplug_dispatch import send_linear, send_scalar
+from helpers import FakeButtplugDevice
+
+
+def test_linear_actuators_share_one_message():
+    device = FakeButtplugDevice(index=3, delay_s=0.05)
+    a, b = LinearActuator(device, 0, "Linear"), LinearActuator(device, 1, "Linear")
+    asyncio.run(send_linear(device, [a, b, a], 300, 0.75))  # duplicate from a second attribute is ignored
+    assert len(device.sent) == 1
+    message = device.sent[0]
+    assert isinstance(message, v1.LinearCmd) and message.device_index == 3
+    assert [(v.index, v.duration, v.position) for v in message.vectors] == [(0, 300, 0.75), (1, 300, 0.75)]
+
+
+def test_mixed_vibrators_are_sent_concurrently():
+    device = FakeButtplugDevice(index=3, delay_s=0.05)
+    actuators = [ScalarActuator(device, 0, "Vibrate", "Vibrate", 20), ScalarActuator(device, 1, "Vibrate", "Vibrate", 20),
+                 VibrateActuator(device, 2)]
+    loop = asyncio.new_event_loop()
+    start = loop.time()
+    loop.run_until_complete(send_scalar(device, actuators, 0.4))
+    elapsed = loop.time() - start
+    loop.close()
+    kinds = sorted(type(m).__name__ for m in device.sent)
+    assert kinds == ["ScalarCmd", "VibrateCmd"]
+    scalar = next(m for m in device.sent if isinstance(m, v3.ScalarCmd))
+    assert [s.index for s in scalar.scalars] == [0, 1]
+    assert elapsed < 0.09  # both round trips overlap instead of adding up
+
+
+def test_error_reply_raises():
+    device = FakeButtplugDevice(index=3, delay_s=0.05, reply=lambda m: v0.Error(m.id, "device gone", ErrorCode.ERROR_DEVICE))
+    with pytest.raises(DeviceServerError):
+        asyncio.run(send_linear(device, [LinearActuator(device, 0, "Linear")], 100, 0.5))
+
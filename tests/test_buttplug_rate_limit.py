@@ -0,0 +1,88 @@
+import asyncio
+
+from buttplug_rate_limit import DEFAULT_GAP_MS, DeviceRateLimiter
+from buttplug_timing import CommandTiming
+
+
+def _recorder(sent):
+    def factory(target):
+        async def send():
+            sent.append((asyncio.get_running_loop().time(), target))
+        return lambda: send()
+    return factory
+
+
+def test_flood_is_coalesced_to_the_newest_target():
+    async def scenario():
+        sent = []
+        job = _recorder(sent)
+        limiter = DeviceRateLimiter(CommandTiming(), min_gap_s=0.05, burst=1)
+        for target in range(10):
+            limiter.submit("linear", job(target))
+        await asyncio.sleep(0.12)
+        return limiter, sent
+
+    limiter, sent = asyncio.run(scenario())
+    assert [t for _, t in sent] == [0, 9]  # first goes out at once, then only the newest
+    assert sent[1][0] - sent[0][0] >= 0.045
+    stats = limiter.stats()
+    assert stats["coalesced"] == 8 and stats["sent"] == 2 and stats["pending"] == 0
+
+
+def test_kinds_do_not_replace_each_other_and_burst_allows_both():
+    async def scenario():
+        sent = []
+        job = _recorder(sent)
+        limiter = DeviceRateLimiter(CommandTiming(), min_gap_s=0.05, burst=2)
+        limiter.submit("linear", job("stroke"))
+        limiter.submit("scalar", job("vibe"))
+        await asyncio.sleep(0)
+        return limiter, sent
+
+    limiter, sent = asyncio.run(scenario())
+    assert sorted(t for _, t in sent) == ["stroke", "vibe"]
+    assert limiter.coalesced == 0
+
+
+def test_clear_drops_waiting_commands_and_gap_comes_from_server():
+    async def scenario():
+        sent = []
+        job = _recorder(sent)
+        limiter = DeviceRateLimiter.for_gap_ms(100, CommandTiming(), burst=1)
+        limiter.submit("linear", job(1))
+        limiter.submit("linear", job(2))
+        limiter.clear()
+        await asyncio.sleep(0.15)
+        return limiter, sent
+
+    limiter, sent = asyncio.run(scenario())
+    assert limiter.min_gap_s == 0.1
+    assert [t for _, t in sent] == [1]
+    assert limiter.dropped == 1
+    assert DeviceRateLimiter.for_gap_ms(None, CommandTiming()).min_gap_s == DEFAULT_GAP_MS / 1000.0
+
+
+def test_commands_are_held_and_coalesced_while_acks_are_outstanding():
+    async def scenario():
+        sent = []
+        ack = asyncio.Event()
+
+        async def slow():
+            await ack.wait()
+
+        job = _recorder(sent)
+        limiter = DeviceRateLimiter(CommandTiming(max_in_flight=1), min_gap_s=0.0, burst=5)
+        limiter.submit("linear", lambda: slow())
+        await asyncio.sleep(0)
+        for target in range(5):
+            limiter.submit("linear", job(target))
+        await asyncio.sleep(0.05)
+        held = list(sent)
+        ack.set()
+        await asyncio.sleep(0.05)
+        return limiter, held, sent
+
+    limiter, held, sent = asyncio.run(scenario())
+    assert held == []
+    assert [t for _, t in sent] == [4]
+    assert limiter.timing.skipped == 0 and limiter.coalesced == 4
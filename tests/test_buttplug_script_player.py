@@ -0,0 +1,64 @@
+import asyncio
+
+from buttplug.client.client import LinearActuator
+
+from buttplug_script_player import ButtplugScriptPlayer, MIN_SEGMENT_MS, script_segments
+from buttplug_timing import CommandTiming
+from compiled_script import compile_script
+from helpers import FakeButtplugDevice
+
+SCRIPT = {"name": "p", "actions": [{"at": 0, "pos_pct": 10}, {"at": 100, "pos_pct": 90}], "duration_ms": 200}
+
+
+class FakeController:
+    def __init__(self, loop):
+        self.loop = loop
+        self._shutting_down = False
+        self.is_connected = True
+        self.device = FakeButtplugDevice()
+        self._linear_actuators = [LinearActuator(self.device, 0, "Linear")]
+        self._vibrator_actuators = []
+        self._rotatory_actuators = []
+        self.timing = CommandTiming()
+
+    def _submit_command(self, kind, factory, period_s=None):
+        self.timing.dispatch(factory(), period_s=period_s)
+
+
+def test_segments_target_the_next_action_and_wrap():
+    segments = script_segments(compile_script(SCRIPT, 100.0, 1e9))
+    # 0 -> 100 ms moves to 90 %, then 100 ms back to the first action (cycle 210 ms incl. loop gap)
+    assert segments == [(0.0, 100, 0.9), (100.0, 110, 0.1)]
+    short = {"actions": [{"at": 0, "pos_pct": 0}, {"at": 5, "pos_pct": 100}], "duration_ms": 5}
+    assert script_segments(compile_script(short, 100.0, 1e9))[0][1] == MIN_SEGMENT_MS
+
+
+def test_player_streams_script_loops_then_stops():
+    async def scenario():
+        controller = FakeController(asyncio.get_running_loop())
+        player = ButtplugScriptPlayer(controller, lead_s=0.0)
+        task = asyncio.ensure_future(player.run())
+        player.set_script(SCRIPT)
+        await asyncio.sleep(0.3 + 0.21 * 2)  # first glide + two cycles
+        player.set_script(None)
+        await asyncio.sleep(0.05)
+        sent = len(controller.device.sent)
+        await asyncio.sleep(0.2)
+        assert len(controller.device.sent) == sent  # nothing after stop
+        controller._shutting_down = True
+        task.cancel()
+        return controller.device
+
+    device = asyncio.run(scenario())
+    positions = [m.vectors[0].position for m in device.sent]
+    assert positions[:5] == [0.1, 0.9, 0.1, 0.9, 0.1]
+    # One move per action, on schedule: the second cycle starts 210 ms after the first
+    times = device.sent_at
+    assert abs((times[3] - times[1]) - 0.21) < 0.03
+
+
+def test_compiled_script_is_reused():
+    compiled = compile_script(SCRIPT, 100.0, 1e9)
+    player = ButtplugScriptPlayer(FakeController(None))
+    player.set_script(compiled)
+    assert player._script is compiled
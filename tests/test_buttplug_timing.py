@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from buttplug_timing import CommandTiming, MAX_LEAD_S
+
+
+async def _ack_after(delay_s, fail=False):
+    await asyncio.sleep(delay_s)
+    if fail:
+        raise RuntimeError("server gone")
+
+
+def test_rtt_is_measured_from_acks_and_sets_the_lead():
+    async def scenario():
+        timing = CommandTiming(alpha=0.5)
+        for _ in range(4):
+            await timing.dispatch(_ack_after(0.04))
+        return timing
+
+    timing = asyncio.run(scenario())
+    stats = timing.stats()
+    assert stats["acked"] == 4 and stats["in_flight"] == 0
+    assert 35 <= stats["rtt_avg_ms"] <= 70
+    assert abs(timing.lead_s - timing.rtt_avg_s / 2) < 1e-9
+    timing.record_rtt(10.0)
+    assert timing.lead_s == MAX_LEAD_S
+
+
+def test_dispatch_does_not_wait_and_tracks_period_error():
+    async def scenario():
+        timing = CommandTiming()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        due = start
+        for _ in range(5):
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            timing.dispatch(_ack_after(0.2), period_s=0.05)  # acks far slower than the strokes
+            due += 0.05
+        elapsed = loop.time() - start
+        await asyncio.sleep(0.25)
+        return timing, elapsed
+
+    timing, elapsed = asyncio.run(scenario())
+    assert elapsed < 0.25  # five 50 ms strokes were not stretched by the 200 ms acks
+    stats = timing.stats()
+    assert stats["sent"] == 5 and timing.periods == 4
+    assert stats["period_err_max_ms"] < 20
+
+
+def test_failed_commands_are_counted():
+    async def scenario():
+        timing = CommandTiming()
+        task = timing.dispatch(_ack_after(0.0, fail=True))
+        await asyncio.gather(task, return_exceptions=True)
+        await asyncio.sleep(0)
+        return timing
+
+    timing = asyncio.run(scenario())
+    assert timing.errors == 1 and timing.acked == 0
+
+
+def test_in_flight_is_capped_and_lost_acks_time_out():
+    async def scenario():
+        timing = CommandTiming(max_in_flight=2, ack_timeout_s=0.05)
+        tasks = [timing.dispatch(_ack_after(10.0)) for _ in range(3)]
+        assert tasks[2] is None and timing.saturated
+        await asyncio.gather(*tasks[:2], return_exceptions=True)
+        await asyncio.sleep(0)
+        return timing
+
+    timing = asyncio.run(scenario())
+    stats = timing.stats()
+    assert stats["skipped"] == 1 and stats["timeouts"] == 2 and stats["errors"] == 2
+    assert stats["in_flight"] == 0 and not timing.saturated
+
+
+def test_cancel_all_drops_unacknowledged_commands():
+    async def scenario():
+        timing = CommandTiming()
+        tasks = [timing.dispatch(_ack_after(10.0)) for _ in range(3)]
+        assert timing.cancel_all() == 3
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return timing, tasks
+
+    timing, tasks = asyncio.run(scenario())
+    assert all(t.cancelled() for t in tasks)
+    assert timing.in_flight == 0 and timing.errors == 0 and not timing.saturated
+
+
+def test_call_waits_for_the_ack_under_the_same_deadline_even_when_saturated():
+    async def scenario():
+        timing = CommandTiming(max_in_flight=1, ack_timeout_s=0.05)
+        timing.dispatch(_ack_after(10.0))
+        assert timing.saturated
+        with pytest.raises(asyncio.TimeoutError):
+            await timing.call(_ack_after(10.0))
+        await asyncio.sleep(0.01)
+        return timing
+
+    timing = asyncio.run(scenario())
+    assert timing.skipped == 0 and timing.timeouts == 2 and timing.in_flight == 0
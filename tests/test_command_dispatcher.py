@@ -0,0 +1,90 @@
+"""
+Unit tests for the non-blocking Handy command dispatcher.
+"""
+import threading
+
+from command_dispatcher import CommandDispatcher
+from helpers import wait_until
+
+
+def test_commands_are_sent_in_order_and_measured():
+    sent = []
+    dispatcher = CommandDispatcher(lambda path, body: sent.append((path, body)))
+    dispatcher.start()
+    dispatcher.submit("hdsp/xava", {"position": 10})
+    assert wait_until(lambda: dispatcher.sent == 1)
+    dispatcher.submit("hamp/stop")
+    dispatcher.stop()
+    dispatcher.join(timeout=2)
+    assert sent == [("hdsp/xava", {"position": 10}), ("hamp/stop", None)]
+    stats = dispatcher.stats()
+    assert stats["sent"] == 2 and stats["queue_depth"] == 0
+    assert stats["avg_latency_ms"] >= 0.0
+
+
+def test_stale_targets_are_coalesced_while_link_is_busy():
+    release = threading.Event()
+    sent = []
+
+    def slow_send(path, body):
+        release.wait(2)
+        sent.append(body["position"])
+
+    dispatcher = CommandDispatcher(slow_send)
+    dispatcher.start()
+    dispatcher.submit("hdsp/xava", {"position": 0})
+    assert wait_until(lambda: dispatcher.depth == 0)  # first command is in flight
+    for pos in (1, 2, 3):
+        dispatcher.submit("hdsp/xava", {"position": pos})
+    assert dispatcher.depth == 1
+    release.set()
+    dispatcher.stop()
+    dispatcher.join(timeout=2)
+    assert sent == [0, 3]
+    assert dispatcher.dropped == 2
+
+
+def test_queue_is_bounded_and_send_errors_are_counted():
+    def failing_send(path, body):
+        raise RuntimeError("boom")
+
+    dispatcher = CommandDispatcher(failing_send, max_pending=2)
+    for i in range(4):
+        dispatcher.submit(f"path/{i}")
+    assert dispatcher.depth == 2 and dispatcher.dropped == 2
+    dispatcher.start()
+    dispatcher.stop()
+    dispatcher.join(timeout=2)
+    assert dispatcher.errors == 2
+
+
+def test_failed_responses_count_as_errors_and_flush_drops_queued_moves():
+    class Resp:
+        def __init__(self, ok):
+            self.ok = ok
+
+    replies = {"hdsp/xava": Resp(False), "servertime": None, "stop": Resp(True)}
+    sent = []
+
+    def send(path, body):
+        sent.append(path)
+        return replies[path]
+
+    dispatcher = CommandDispatcher(send)
+    dispatcher.submit("hdsp/xava", {"position": 1})
+    dispatcher.submit("servertime")
+    dispatcher.submit("stop", flush=True)
+    dispatcher.submit("job", send=lambda path, body: sent.append(path) or False)
+    dispatcher.start()
+    dispatcher.stop()
+    dispatcher.join(timeout=2)
+    assert sent == ["stop", "job"]
+    assert dispatcher.dropped == 2 and dispatcher.errors == 1
+
+    dispatcher = CommandDispatcher(send)
+    dispatcher.submit("hdsp/xava", {"position": 1})
+    dispatcher.submit("servertime")
+    dispatcher.start()
+    dispatcher.stop()
+    dispatcher.join(timeout=2)
+    assert dispatcher.errors == 2
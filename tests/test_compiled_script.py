@@ -0,0 +1,52 @@
+"""
+Unit tests for precompiled player scripts.
+"""
+from compiled_script import compile_script, reachable_script, CompiledScript, TAIL_VELOCITY_MM_S
+
+
+SCRIPT = {
+    "name": "generated",
+    "actions": [{"at": 0, "pos_pct": 0}, {"at": 500, "pos_pct": 50}, {"at": 505, "pos_pct": 100}],
+    "duration_ms": 505,
+}
+
+
+def test_compile_precomputes_targets_and_capped_velocities():
+    compiled = compile_script(SCRIPT, 110.0, 400.0)
+    assert isinstance(compiled, CompiledScript) and len(compiled) == 3
+    assert list(compiled.target_mm) == [0.0, 55.0, 110.0]
+    # 55 mm in 0.5 s, then 55 mm in the 10 ms minimum step (capped), then the tail velocity
+    assert list(compiled.velocities) == [110.0, 400.0, TAIL_VELOCITY_MM_S]
+    assert compiled.cycle_ms == 515.0
+
+
+def test_recompile_only_when_limits_change():
+    compiled = compile_script(SCRIPT, 110.0, 400.0)
+    assert compiled.recompile(110.0, 400.0) is compiled
+    slower = compiled.recompile(110.0, 50.0)
+    assert slower is not compiled
+    assert slower.times_ms is compiled.times_ms
+    assert list(slower.velocities) == [50.0, 50.0, TAIL_VELOCITY_MM_S]
+    assert compile_script(slower, 110.0, 50.0) is slower
+
+
+def test_empty_scripts_compile_to_none():
+    assert compile_script(None, 110.0, 400.0) is None
+    assert compile_script({"actions": []}, 110.0, 400.0) is None
+
+
+def test_steps_to_script_accumulates_sleeps():
+    from compiled_script import steps_to_script
+    script = steps_to_script([{"dp": 20, "sleep": 0.25}, {"dp": 80, "sleep": 0.5}])
+    assert script["actions"] == [{"at": 0, "pos_pct": 20}, {"at": 250, "pos_pct": 80}]
+    assert script["duration_ms"] == 750
+    assert steps_to_script([]) is None
+
+
+def test_reachable_script_bakes_in_the_velocity_cap():
+    # 55 mm/s over 110 mm travel: at most 50% per second
+    limited = reachable_script(compile_script(SCRIPT, 110.0, 55.0))
+    assert [a["at"] for a in limited["actions"]] == [0, 500, 505]
+    assert [a["pos_pct"] for a in limited["actions"]] == [0.0, 25.0, 25.25]
+    unlimited = reachable_script(compile_script(SCRIPT, 110.0, 1e9))
+    assert [a["pos_pct"] for a in unlimited["actions"]] == [0.0, 50.0, 100.0]
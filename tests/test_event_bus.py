@@ -0,0 +1,53 @@
+"""
+Unit tests for the UI push-channel event bus.
+"""
+import itertools
+import json
+import time
+
+from event_bus import EventBus, format_sse
+
+
+def test_publish_fans_out_to_every_subscriber():
+    bus = EventBus()
+    a, b = bus.subscribe(), bus.subscribe()
+    bus.publish("chat", {"text": "hi"})
+    assert a.get(timeout=0.1) == [("chat", {"text": "hi"})]
+    assert b.get(timeout=0.1) == [("chat", {"text": "hi"})]
+    bus.unsubscribe(b)
+    bus.publish("mode", {"active_mode": None})
+    assert bus.subscriber_count == 1
+    assert b.get(timeout=0.01) == []
+
+
+def test_slow_subscriber_drops_oldest_events_and_times_out_when_idle():
+    bus = EventBus(max_events=2)
+    sub = bus.subscribe()
+    for i in range(3):
+        bus.publish("status", {"n": i})
+    assert [data["n"] for _, data in sub.get(timeout=0.1)] == [1, 2]
+    assert sub.dropped == 1
+    start = time.monotonic()
+    assert sub.get(timeout=0.05) == []
+    assert time.monotonic() - start >= 0.04
+
+
+def test_watch_publishes_only_changes_and_survives_snapshot_errors():
+    bus = EventBus()
+    sub = bus.subscribe()
+    values = itertools.chain([{"v": 1}, {"v": 1}, RuntimeError("boom")], itertools.repeat({"v": 2}))
+
+    def snapshot():
+        value = next(values)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    bus.watch("status", snapshot, interval_s=0.005)
+    seen = []
+    deadline = time.monotonic() + 2
+    while len(seen) < 2 and time.monotonic() < deadline:
+        seen += [data for _, data in sub.get(timeout=0.05)]
+    assert seen == [{"v": 1}, {"v": 2}]
+    frame = format_sse("status", {"v": 2})
+    assert frame.startswith("event: status\n") and json.loads(frame.split("data: ")[1]) == {"v": 2}
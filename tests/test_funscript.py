@@ -0,0 +1,25 @@
+"""
+Unit tests for funscript serialization used by HSSP playback.
+"""
+import json
+
+from funscript import script_to_funscript, funscript_bytes
+
+
+def test_script_to_funscript_converts_player_actions():
+    script = {"name": "generated", "actions": [{"at": 0, "pos_pct": 20.4}, {"at": 250.6, "pos_pct": 80}]}
+    fs = script_to_funscript(script)
+    assert fs["actions"] == [{"at": 0, "pos": 20}, {"at": 251, "pos": 80}]
+    assert fs["metadata"]["title"] == "generated"
+
+
+def test_script_to_funscript_sorts_clamps_and_dedupes_timestamps():
+    script = {"actions": [{"at": 100, "pos_pct": 150}, {"at": 0, "pos": -5}, {"at": 100, "pos_pct": 40}]}
+    fs = script_to_funscript(script)
+    assert fs["actions"] == [{"at": 0, "pos": 0}, {"at": 100, "pos": 40}]
+
+
+def test_funscript_bytes_is_stable_and_handles_empty_script():
+    payload, digest = funscript_bytes(None)
+    assert json.loads(payload)["actions"] == []
+    assert funscript_bytes(None)[1] == digest
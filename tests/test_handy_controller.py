@@ -0,0 +1,31 @@
+"""
+Tests for HandyController teardown when the device interface is switched.
+"""
+import importlib
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def handy_controller(monkeypatch):
+    # Only the LLMService name is needed, so the test doesn't depend on llm_service importing cleanly
+    monkeypatch.setitem(sys.modules, "llm_service", types.SimpleNamespace(LLMService=object))
+    monkeypatch.delitem(sys.modules, "script_engine", raising=False)
+    monkeypatch.delitem(sys.modules, "handy_controller", raising=False)
+    return importlib.import_module("handy_controller")
+
+
+def test_switching_interface_shuts_down_the_old_controller(handy_controller):
+    sent = []
+    controller = handy_controller.HandyController("key")
+    controller._send_command = lambda path, body=None: sent.append(path) or True
+
+    # /set_interface tears down whatever controller is active through disconnect()
+    controller.disconnect()
+
+    assert not controller.dispatcher.is_alive()
+    assert not controller.script_player.is_alive()
+    assert sent == ["hamp/stop"]  # the device was stopped before the sender shut down
+    controller.disconnect()  # a second teardown is harmless
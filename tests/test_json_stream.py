@@ -0,0 +1,51 @@
+"""
+Unit tests for the incremental JSON field parser used for streamed LLM replies.
+"""
+import json
+
+from json_stream import JsonFieldStream
+
+
+def test_fields_fire_as_soon_as_each_is_complete():
+    seen = []
+    stream = JsonFieldStream(lambda k, v: seen.append((k, v)))
+    stream.feed('{"chat": "Hel')
+    assert seen == []
+    stream.feed('lo, \\"you\\"", "action_tag": "tip", "modif')
+    assert seen == [("chat", 'Hello, "you"'), ("action_tag", "tip")]
+    stream.feed('iers": {"speed": 40, "depth": [1, 2]}')
+    assert seen[-1] == ("modifiers", {"speed": 40, "depth": [1, 2]})
+    stream.feed(', "n": 12}')
+    assert seen[-1] == ("n", 12)
+    assert stream.done
+
+
+def test_one_char_chunks_and_leading_noise_match_json_loads():
+    payload = {"chat": "a{b}[c],:", "modifiers": {"speed": 1.5}, "flag": True, "x": None}
+    text = "Sure! " + json.dumps(payload)
+    stream = JsonFieldStream()
+    for ch in text:
+        stream.feed(ch)
+    assert stream.fields == payload
+    assert stream.done
+
+
+def test_truncated_or_invalid_values_are_not_emitted():
+    seen = []
+    stream = JsonFieldStream(lambda k, v: seen.append(k))
+    stream.feed('{"chat": "ok", "speed": 4x, "modifiers": {"speed": 3')
+    assert seen == ["chat"]
+    assert not stream.done
+
+
+def test_long_value_across_chunks_and_text_is_everything_fed():
+    chat = "word " * 2000
+    text = json.dumps({"chat": chat, "n": 1})
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    stream = JsonFieldStream()
+    for chunk in chunks[:-1]:
+        stream.feed(chunk)
+    assert stream.fields == {"chat": chat}
+    assert stream.text == "".join(chunks[:-1])
+    stream.feed(chunks[-1])
+    assert stream.fields == {"chat": chat, "n": 1} and stream.text == text
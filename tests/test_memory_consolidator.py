@@ -0,0 +1,89 @@
+"""
+Unit tests for the background profile consolidation worker.
+"""
+from collections import deque
+
+from helpers import wait_until
+from memory_consolidator import MemoryConsolidator
+
+
+class _FakeLLM:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def consolidate_user_profile(self, chunk, profile):
+        self.calls.append(list(chunk))
+        if self.fail:
+            raise RuntimeError("llm down")
+        return {**profile, "seen": len(chunk)}
+
+
+class _FakeSettings:
+    def __init__(self):
+        self.user_profile = {}
+        self.saves = 0
+
+    def save(self):
+        self.saves += 1
+
+
+def _history(n):
+    return deque(({"role": "user", "content": f"m{i}"} for i in range(n)), maxlen=50)
+
+
+def test_worker_consolidates_after_every_n_messages():
+    llm, settings = _FakeLLM(), _FakeSettings()
+    history = _history(3)
+    worker = MemoryConsolidator(llm, history, settings, every_n_messages=3, interval_s=60, window=2)
+    worker.start()
+    for _ in range(3):
+        worker.note_message()
+    assert wait_until(lambda: worker.runs > 0)
+    worker.stop()
+    # The batch covers every message since the last run, even beyond the window
+    assert len(llm.calls[0]) == 3
+    assert settings.user_profile == {"seen": 3} and settings.saves == 1
+    stats = worker.stats()
+    assert stats["pending_messages"] == 0 and stats["profile_age_s"] is not None
+
+
+def test_flush_is_a_no_op_without_pending_messages_or_when_disabled():
+    llm, settings = _FakeLLM(), _FakeSettings()
+    worker = MemoryConsolidator(llm, _history(4), settings, enabled=lambda: False)
+    worker.flush()
+    worker.note_message()
+    worker.flush()
+    assert llm.calls == []
+    assert worker.stats()["profile_age_s"] is None
+
+
+def test_failed_consolidation_keeps_last_profile_and_counts_error():
+    llm, settings = _FakeLLM(fail=True), _FakeSettings()
+    settings.user_profile = {"name": "Sam"}
+    worker = MemoryConsolidator(llm, _history(2), settings)
+    worker.note_message()
+    worker.flush()
+    assert settings.user_profile == {"name": "Sam"}
+    assert worker.errors == 1 and worker.runs == 0
+
+
+def test_failed_batch_is_retried_and_messages_during_a_run_stay_pending():
+    llm, settings = _FakeLLM(fail=True), _FakeSettings()
+    worker = MemoryConsolidator(llm, _history(3), settings)
+    for _ in range(3):
+        worker.note_message()
+    worker.flush()
+    assert worker.pending_messages == 3
+
+    llm.fail = False
+    real_consolidate = llm.consolidate_user_profile
+
+    def consolidate_while_chatting(chunk, profile):
+        worker.note_message()  # arrives mid-run; belongs to the next batch
+        return real_consolidate(chunk, profile)
+
+    llm.consolidate_user_profile = consolidate_while_chatting
+    worker.flush()
+    assert worker.runs == 1 and len(llm.calls[-1]) == 3
+    assert worker.pending_messages == 1
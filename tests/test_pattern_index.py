@@ -0,0 +1,12 @@
+"""
+Unit tests for the weighted selection index.
+"""
+from pattern_index import FenwickTree
+
+
+def test_fenwick_find_and_update():
+    tree = FenwickTree([1.0, 0.0, 2.0, 3.0])
+    assert [tree.find(v) for v in (0.0, 0.99, 1.0, 2.99, 3.0, 5.99)] == [0, 0, 2, 2, 3, 3]
+    tree.add(1, 4.0)
+    assert tree.total == 10.0 and tree.find(1.5) == 1 and tree.find(5.0) == 2
+
@@ -0,0 +1,44 @@
+"""
+Unit tests for the append-only pattern boost/usage log.
+"""
+from pattern_stats_store import PatternStatsStore
+
+
+def test_compaction_keeps_totals_and_shrinks_log(tmp_path):
+    path = tmp_path / "stats.jsonl"
+    store = PatternStatsStore(path, flush_interval_s=60, compact_min_lines=50)
+    store.start()
+    for i in range(500):
+        store.record_boost("a", 0.5)
+        store.record_use(f"p{i % 5}", ts=1000.0 + i)
+    store.stop()
+    store.flush()
+    assert store.compactions >= 1
+    assert len(path.read_text().splitlines()) == 1
+
+    seen = {}
+    reloaded = PatternStatsStore(path, on_loaded=lambda w, lu: seen.update(w=w, lu=lu))
+    reloaded.start()
+    assert reloaded.loaded.wait(2)
+    reloaded.stop()
+    assert seen["w"]["a"] == 250.0
+    assert seen["lu"]["p4"] == 1499.0
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "stats.jsonl"
+    path.write_text('{"b":"a","v":1.0}\n{"u":"a","ts":5.0}\n{"b":"a","v"')
+    store = PatternStatsStore(path)
+    store.start()
+    assert store.loaded.wait(2)
+    store.stop()
+    assert store.weights == {"a": 1.0}
+    assert store.last_used == {"a": 5.0}
+    # The fragment is cut off, so the next append isn't glued onto it
+    store.record_boost("b", 2.0)
+    store.flush()
+    reloaded = PatternStatsStore(path)
+    reloaded.start()
+    assert reloaded.loaded.wait(2)
+    reloaded.stop()
+    assert reloaded.weights == {"a": 1.0, "b": 2.0}
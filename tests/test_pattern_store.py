@@ -0,0 +1,41 @@
+"""
+Unit tests for the memory-mapped pattern library cache.
+"""
+import json
+import os
+
+import pytest
+
+from helpers import write_pattern_packs
+from pattern_store import PatternStore
+
+
+def test_directory_of_packs_builds_then_reuses_cache(tmp_path):
+    packs = write_pattern_packs(tmp_path)
+    store = PatternStore(packs)
+    assert store.rebuilt
+    assert sorted(p[0] for p in store.patterns) == ["Slow Wave", "Tip_Flick"]
+    slot = [p[0] for p in store.patterns].index("Tip_Flick")
+    assert store.actions(slot) == [{"at": 0.0, "pos": 80.0}, {"at": 100.0, "pos": 90.0}]
+    store.close()
+    assert not PatternStore(packs).rebuilt
+
+
+def test_changed_pack_invalidates_cache(tmp_path):
+    packs = write_pattern_packs(tmp_path)
+    PatternStore(packs).close()
+    fs = packs / "slow_wave.funscript"
+    fs.write_text(json.dumps({"actions": [{"at": 0, "pos": 1}, {"at": 10, "pos": 2}]}))
+    os.utime(fs, ns=(1, 1))
+    store = PatternStore(packs)
+    assert store.rebuilt
+    assert "slow_wave" in [p[0] for p in store.patterns]
+
+
+def test_reading_a_closed_store_fails_cleanly(tmp_path):
+    store = PatternStore(write_pattern_packs(tmp_path))
+    store.close()
+    assert store.closed
+    with pytest.raises(ValueError, match="closed"):
+        store.actions(0)
+    store.close()  # closing twice is harmless
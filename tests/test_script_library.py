@@ -0,0 +1,140 @@
+"""
+Unit tests for ScriptLibrary: selection, scale_to_user (including the NumPy path), the pattern cache
+and persisted stats.
+"""
+import json
+import random
+import time
+from collections import Counter
+
+import pytest
+
+import script_library
+from helpers import write_pattern_packs
+from pattern_store import StoredPattern
+from script_library import ScriptLibrary
+
+
+def _library(patterns):
+    lib = ScriptLibrary([])
+    lib._ingest(patterns)
+    return lib
+
+
+def _indexed_library(n=6):
+    return _library({f"p{i}": {"name": f"p{i}", "zone": "mid", "tags": ["Wave" if i % 2 else "Pulse"],
+                               "actions": [{"at": 0, "pos": 0}, {"at": 100, "pos": 100}]} for i in range(n)})
+
+
+def _library_with_stats(tmp_path, stats_path):
+    lib_file = tmp_path / "lib.json"
+    if not lib_file.exists():
+        lib_file.write_text(json.dumps({
+            "a": {"name": "a", "tags": ["wave"], "zone": "mid", "actions": [{"at": 0, "pos": 10}, {"at": 500, "pos": 90}]},
+            "b": {"name": "b", "tags": ["pulse"], "zone": "mid", "actions": [{"at": 0, "pos": 20}, {"at": 400, "pos": 80}]},
+        }))
+    lib = ScriptLibrary([lib_file], stats_path=stats_path)
+    assert lib.stats_store.loaded.wait(2)
+    return lib
+
+
+def _random_pattern(seed, n):
+    r = random.Random(seed)
+    at = 0.0
+    actions = []
+    for _ in range(n):
+        at += r.choice([0, 10, 25, 40, 80, 150, 333.3])
+        actions.append({"at": at, "pos": r.choice([r.uniform(0, 100), 50, 49.5, 10])})
+    return {"name": f"p{seed}", "tags": ["wave"], "actions": actions}
+
+
+@pytest.mark.skipif(script_library.np is None, reason="NumPy not installed")
+@pytest.mark.parametrize("seed", range(12))
+def test_vectorized_path_matches_python_path_exactly(seed, monkeypatch):
+    lib = _library({f"p{seed}": _random_pattern(seed, 40 + seed * 17)})
+    pat = lib._patterns[0]
+    args = (pat, ["tip", "mid", "base", "full"][seed % 4], 10 + seed, 90 - seed, 3 + seed)
+    kwargs = dict(jitter_dp_frac=0.02 * (seed % 3), jitter_rng_frac=0.10 * (seed % 2),
+                  rng_cap_frac_override=None if seed % 5 else 1.4, seed=seed)
+
+    fast = lib.scale_to_user(*args, **kwargs)
+    monkeypatch.setattr(script_library, "np", None)
+    slow = lib.scale_to_user(*args, **kwargs)
+    assert fast == slow
+    assert all(type(st["dp"]) is int and type(st["sleep"]) is float for st in fast)
+
+
+def test_short_pattern_merges_near_duplicates():
+    lib = _library({"p": {"name": "p", "actions": [
+        {"at": 0, "pos": 0}, {"at": 20, "pos": 0}, {"at": 40, "pos": 0}, {"at": 1000, "pos": 100}]}})
+    steps = lib.scale_to_user(lib._patterns[0], "mid", 0, 100, 1.0, seed=1)
+    # The three quick repeats at the base collapse into one step holding their combined sleep
+    assert len(steps) == 2
+    assert steps[0]["sleep"] == pytest.approx(0.09)
+
+
+def test_missing_or_single_action_pattern_uses_fallback_steps():
+    lib = _library({})
+    assert len(lib.scale_to_user(None, "tip", 0, 100, 5.0)) == 10
+    assert lib.scale_to_user({"actions": [{"at": 0, "pos": 5}]}, "tip", 0, 100, 5.0) == lib._fallback_steps("tip", 0, 100, 5.0)
+
+
+def test_sampling_matches_weighted_scan_distribution(monkeypatch):
+    lib = _indexed_library()
+    lib.boost_pattern("p0", 2.0)             # base weight 3
+    lib.mark_used("p1")                      # recency penalty 0.25x
+    random.seed(7)
+    draws = 20000
+    counts = Counter(lib.select("mid", avoid_names={"p5"}, preferred_tags=["wave"])["name"] for _ in range(draws))
+    expected = {"p0": 3.0, "p1": 0.25 * 1.35, "p2": 1.0, "p3": 1.35, "p4": 1.0}
+    total = sum(expected.values())
+    assert "p5" not in counts
+    for name, w in expected.items():
+        assert counts[name] / draws == pytest.approx(w / total, abs=0.015)
+
+
+def test_heavy_avoidance_falls_back_to_exact_scan():
+    lib = _indexed_library(4)
+    random.seed(1)
+    picks = {lib.select("mid", avoid_names={"p0", "p1", "p2"})["name"] for _ in range(50)}
+    assert picks == {"p3"}
+    # Everything avoided: the scan ignores the avoid lists rather than returning nothing
+    assert lib.select("mid", avoid_classes={"wave", "pulse"})["name"].startswith("p")
+    assert ScriptLibrary([]).select("mid") is None
+
+
+def test_library_materializes_selected_pattern_like_in_memory_ingest(tmp_path):
+    packs = write_pattern_packs(tmp_path)
+    lib = ScriptLibrary([tmp_path / "missing.json", packs])
+    entry = next(p for p in lib._patterns if p["name"] == "Slow Wave")
+    assert isinstance(entry, StoredPattern) and "actions" not in entry
+    pat = lib.select("mid", preferred_tags=["wave"], avoid_names={"Tip_Flick"})
+    assert pat["name"] == "Slow Wave" and len(pat["actions"]) == 3
+
+    in_memory = ScriptLibrary([])
+    in_memory._ingest({"Slow Wave": {"tags": ["wave"], "actions": pat["actions"]}})
+    assert lib.scale_to_user(pat, "mid", 0, 100, 4, jitter_dp_frac=0.02, seed=3) == \
+        in_memory.scale_to_user(in_memory._patterns[0], "mid", 0, 100, 4, jitter_dp_frac=0.02, seed=3)
+
+
+def test_close_releases_the_pattern_cache_map(tmp_path):
+    lib = ScriptLibrary([write_pattern_packs(tmp_path)])
+    store = lib._store
+    lib.close()
+    assert store.closed
+    lib.close()  # closing twice is harmless
+
+
+def test_boosts_and_uses_survive_restart(tmp_path):
+    stats_path = tmp_path / "stats.jsonl"
+    lib = _library_with_stats(tmp_path, stats_path)
+    lib.boost_pattern("a", 2.0)
+    lib.mark_used("b")
+    lib.close()
+
+    lib2 = _library_with_stats(tmp_path, stats_path)
+    assert lib2._weights["a"] == 2.0
+    assert lib2._last_used["b"] > time.time() - 60
+    slot = lib2._index.slots_for("a")[0]
+    assert lib2._index.base[slot] == 3.0
+    lib2.close()
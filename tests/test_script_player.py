@@ -0,0 +1,73 @@
+"""
+Unit tests for ScriptPlayer scheduling.
+"""
+import threading
+import time
+
+from script_player import ScriptPlayer
+
+
+class _RecordingDispatcher:
+    def __init__(self, latency_ms=0.0):
+        self.avg_latency_ms = latency_ms
+        self.sent = []
+        self.event = threading.Event()
+
+    def submit(self, path, body=None, coalesce_key=None):
+        self.sent.append((time.monotonic(), path, body))
+        self.event.set()
+
+
+class _FakeHandy:
+    FULL_TRAVEL_MM = 110.0
+    current_max_velocity_mm_s = 400.0
+
+    def __init__(self, latency_ms=0.0):
+        self.dispatcher = _RecordingDispatcher(latency_ms)
+
+
+def _run_player(script, latency_ms=0.0, run_for=0.35, loop=False):
+    handy = _FakeHandy(latency_ms)
+    player = ScriptPlayer(handy)
+    player.loop = loop
+    player.start()
+    started = time.monotonic()
+    player.set_script(script)
+    time.sleep(run_for)
+    player.stop()
+    player.join(timeout=1)
+    return handy, player, started
+
+
+def test_actions_are_dispatched_on_schedule():
+    script = {"actions": [{"at": 0, "pos_pct": 0}, {"at": 100, "pos_pct": 50}, {"at": 200, "pos_pct": 100}]}
+    handy, player, started = _run_player(script)
+    times = [t - started for t, _, _ in handy.dispatcher.sent]
+    assert len(times) == 3
+    assert abs(times[1] - 0.1) < 0.05 and abs(times[2] - 0.2) < 0.05
+    assert handy.dispatcher.sent[2][2]["position"] == 110.0
+    stats = player.stats()
+    assert stats["actions"] == 3 and stats["late_max_ms"] < 50
+
+
+def test_actions_are_sent_early_by_half_the_link_latency():
+    script = {"actions": [{"at": 0, "pos_pct": 0}, {"at": 200, "pos_pct": 100}]}
+    handy, player, started = _run_player(script, latency_ms=200.0)
+    assert abs((handy.dispatcher.sent[1][0] - started) - 0.1) < 0.05
+    assert player.stats()["lead_ms"] == 100.0
+
+
+def test_new_script_and_stop_interrupt_a_long_wait():
+    script = {"actions": [{"at": 0, "pos_pct": 0}, {"at": 10_000, "pos_pct": 100}]}
+    handy = _FakeHandy()
+    player = ScriptPlayer(handy)
+    player.loop = False
+    player.start()
+    player.set_script(script)
+    assert handy.dispatcher.event.wait(1)
+    player.set_script({"actions": [{"at": 0, "pos_pct": 20}]})
+    time.sleep(0.05)
+    player.stop()
+    player.join(timeout=1)
+    assert not player.is_alive()
+    assert [body["position"] for _, _, body in handy.dispatcher.sent] == [0.0, 22.0]
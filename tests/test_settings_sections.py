@@ -0,0 +1,46 @@
+import json
+
+from settings_sections import ColdSections
+
+
+def _sections(tmp_path):
+    cold = ColdSections(tmp_path / "my_settings.d", ("user_profile", "rules"))
+    cold.set("user_profile", {"name": ""})
+    cold.set("rules", {})
+    cold.seal_defaults()
+    return cold
+
+
+def test_only_changed_sections_are_written(tmp_path):
+    cold = _sections(tmp_path)
+    cold.set("user_profile", {"name": "Sam"})
+    assert cold.write_dirty() == ["user_profile"]
+    assert not cold.path("rules").exists()
+    assert cold.write_dirty() == []
+    cold.get("user_profile")["likes"] = ["slow"]
+    cold.mark_dirty("user_profile")
+    assert cold.write_dirty() == ["user_profile"]
+    assert json.loads(cold.path("user_profile").read_text()) == {"name": "Sam", "likes": ["slow"]}
+
+
+def test_sections_load_lazily_with_defaults(tmp_path):
+    cold = _sections(tmp_path)
+    cold.set("rules", {"no": "fast"})
+    cold.write_dirty()
+
+    fresh = _sections(tmp_path)
+    assert fresh.stats()["loaded"] == []
+    assert fresh.get("rules") == {"no": "fast"}
+    assert fresh.get("user_profile") == {"name": ""}
+    assert fresh.stats()["file_loads"] == 1
+    fresh.get("user_profile")["name"] = "x"  # defaults are copied, never shared
+    assert _sections(tmp_path).get("user_profile") == {"name": ""}
+
+
+def test_legacy_section_is_adopted_only_once(tmp_path):
+    cold = _sections(tmp_path)
+    assert cold.adopt_legacy("rules", {"old": 1})
+    cold.write_dirty()
+    again = _sections(tmp_path)
+    assert not again.adopt_legacy("rules", {"stale": 1})
+    assert again.get("rules") == {"old": 1}
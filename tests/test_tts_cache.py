@@ -0,0 +1,33 @@
+"""
+Unit tests for the content-addressed TTS disk cache.
+"""
+from tts_cache import TTSCache, cache_key
+
+
+def test_key_ignores_spacing_but_not_voice_or_settings():
+    base = cache_key("voice", "model", {"stability": 0.4}, "Okay,  you're in control now. ")
+    assert base == cache_key("voice", "model", {"stability": 0.4}, "Okay, you're in control now.")
+    assert base != cache_key("other", "model", {"stability": 0.4}, "Okay, you're in control now.")
+    assert base != cache_key("voice", "model", {"stability": 0.5}, "Okay, you're in control now.")
+
+
+def test_put_get_and_reload_from_disk(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=1000)
+    assert cache.get("a") is None
+    cache.put("a", b"mp3-bytes")
+    assert cache.get("a") == b"mp3-bytes"
+    reloaded = TTSCache(tmp_path, max_bytes=1000)
+    assert "a" in reloaded and reloaded.total_bytes == len(b"mp3-bytes")
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_lru_eviction_keeps_recently_used_and_skips_oversized(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=10)
+    cache.put("old", b"1234")
+    cache.put("used", b"5678")
+    cache.get("old")
+    cache.put("new", b"9abc")
+    assert "used" not in cache and "old" in cache and "new" in cache
+    assert not (tmp_path / "used.mp3").exists()
+    cache.put("huge", b"x" * 11)
+    assert "huge" not in cache and cache.evictions == 1
@@ -0,0 +1,64 @@
+"""
+Unit tests for the ordered TTS worker pool.
+"""
+import threading
+
+from helpers import wait_until
+from tts_worker_pool import TTSWorkerPool
+
+
+def test_clips_are_released_in_message_order_even_if_later_lines_finish_first():
+    out = []
+    first_may_finish = threading.Event()
+
+    def synthesize(text, emit):
+        if text == "first":
+            first_may_finish.wait(2)
+        emit(text + "-a")
+        emit(text + "-b")
+
+    pool = TTSWorkerPool(synthesize, out.append, num_workers=2)
+    pool.submit("first")
+    pool.submit("second")
+    assert wait_until(lambda: pool.stats()["held_clips"] == 2)
+    assert out == []
+    first_may_finish.set()
+    assert wait_until(lambda: len(out) == 4)
+    assert out == ["first-a", "first-b", "second-a", "second-b"]
+    pool.stop()
+
+
+def test_backlog_over_threshold_drops_oldest_waiting_lines():
+    out = []
+    gate = threading.Event()
+
+    def synthesize(text, emit):
+        gate.wait(2)
+        emit(text)
+
+    pool = TTSWorkerPool(synthesize, out.append, num_workers=1, max_backlog=2)
+    pool.submit("busy")
+    assert wait_until(lambda: pool.in_flight == 1)
+    for text in ("stale", "newer", "newest"):
+        pool.submit(text)
+    assert pool.stats()["dropped"] == 1 and pool.backlog == 2
+    gate.set()
+    assert wait_until(lambda: len(out) == 3)
+    assert out == ["busy", "newer", "newest"]
+    pool.stop()
+
+
+def test_failed_line_does_not_block_later_ones():
+    out = []
+
+    def synthesize(text, emit):
+        if text == "bad":
+            raise RuntimeError("tts down")
+        emit(text)
+
+    pool = TTSWorkerPool(synthesize, out.append, num_workers=1)
+    pool.submit("bad")
+    pool.submit("good")
+    assert wait_until(lambda: out == ["good"])
+    assert pool.stats()["errors"] == 1
+    pool.stop()
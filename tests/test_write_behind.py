@@ -0,0 +1,48 @@
+import json
+import time
+
+from write_behind import WriteBehindSaver, atomic_write_text
+
+
+def test_burst_of_requests_coalesces_into_one_write():
+    writes = []
+    saver = WriteBehindSaver(lambda: writes.append(time.monotonic()), delay_s=0.05, max_delay_s=1.0)
+    start = time.monotonic()
+    for _ in range(20):
+        saver.request()
+    assert time.monotonic() - start < 0.05  # request() never waits for the disk
+    time.sleep(0.3)
+    assert len(writes) == 1
+    assert saver.stats()["requests"] == 20
+    assert not saver.pending
+    saver.stop()
+
+
+def test_flush_writes_pending_state_synchronously(tmp_path):
+    path = tmp_path / "settings.json"
+    state = {"ai_name": "BOT"}
+    saver = WriteBehindSaver(lambda: atomic_write_text(path, json.dumps(state)), delay_s=30, max_delay_s=60)
+    state["ai_name"] = "Ava"
+    saver.request()
+    assert not path.exists()
+    saver.flush()
+    assert json.loads(path.read_text()) == {"ai_name": "Ava"}
+    assert list(tmp_path.iterdir()) == [path]  # no temp files left behind
+    saver.stop()
+
+
+def test_failed_write_stays_pending():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    saver = WriteBehindSaver(flaky, delay_s=30, max_delay_s=60)
+    saver.request()
+    saver.flush()
+    assert saver.errors == 1 and saver.pending
+    saver.flush()
+    assert saver.writes == 1 and not saver.pending
+    saver.stop()
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+def normalize_text(text):
+    """Whitespace-insensitive form of a line, so trivially different spacing shares an entry."""
+    return re.sub(r"\s+", " ", (text or "").strip())
+
+def cache_key(voice_id, model_id, voice_settings, text):
+    """Content address of one rendered line: everything that changes the audio, and nothing else."""
+    material = json.dumps([voice_id, model_id, voice_settings or {}, normalize_text(text)],
+                          sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class TTSCache:
+    """
+    On-disk cache of synthesized clips (one .mp3 per key) with size-bounded LRU eviction.
+    Recency survives restarts through file mtimes, which are bumped on every hit.
+    """
+
+    SUFFIX = ".mp3"
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # key -> size, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    def _path(self, key):
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    def _load_index(self):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            files = sorted(self.directory.glob(f"*{self.SUFFIX}"), key=lambda p: p.stat().st_mtime)
+        except OSError as e:
+            print(f"TTS cache unavailable at {self.directory}: {e}")
+            return
+        for path in files:
+            size = path.stat().st_size
+            self._index[path.stem] = size
+            self.total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.total_bytes -= self._index.pop(key, 0)
+                self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        if not data or len(data) > self.max_bytes:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            print(f"TTS cache write failed: {e}")
+            return
+        with self._lock:
+            self.total_bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._index
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = len(self._index)
+        return {
+            "entries": entries,
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
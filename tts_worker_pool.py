@@ -0,0 +1,116 @@
+import threading
+from collections import deque
+
+class TTSWorkerPool:
+    """
+    Fixed set of TTS workers fed by a sequence-numbered queue.
+    Messages are synthesized in parallel, but their clips reach `output` strictly in message order:
+    the oldest unfinished message streams straight through, later ones are held until it completes.
+    When the backlog exceeds `max_backlog`, the oldest waiting lines are dropped as stale.
+    """
+
+    def __init__(self, synthesize, output, num_workers=2, max_backlog=4):
+        # synthesize(text, emit) calls emit(clip) for each clip it produces; output(clip) queues it for playback
+        self._synthesize = synthesize
+        self._output = output
+        self.max_backlog = max(1, int(max_backlog))
+        self._pending = deque()  # (seq, text)
+        self._cond = threading.Condition()
+        self._order_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        self._next_seq = 0
+        self._next_release = 0
+        self._held = {}  # seq -> clips waiting for earlier messages
+        self._finished = set()
+
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_backlog_seen = 0
+
+        self._workers = [threading.Thread(target=self._work, daemon=True, name=f"TTSWorker-{i}")
+                         for i in range(max(1, int(num_workers)))]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, text):
+        """Queue a line for synthesis. Returns its sequence number."""
+        stale = []
+        with self._cond:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._pending.append((seq, text))
+            self.submitted += 1
+            while len(self._pending) > self.max_backlog:
+                stale.append(self._pending.popleft()[0])
+                self.dropped += 1
+            self.max_backlog_seen = max(self.max_backlog_seen, len(self._pending))
+            self._cond.notify()
+        for old_seq in stale:
+            self._complete(old_seq)
+        return seq
+
+    @property
+    def backlog(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop_event.is_set():
+                    self._cond.wait()
+                if self._stop_event.is_set():
+                    return
+                seq, text = self._pending.popleft()
+                self.in_flight += 1
+            try:
+                self._synthesize(text, lambda clip, seq=seq: self._emit(seq, clip))
+            except Exception as e:
+                self.errors += 1
+                print(f"🔥 TTS worker error: {e}")
+            finally:
+                with self._cond:
+                    self.in_flight -= 1
+                    self.completed += 1
+                self._complete(seq)
+
+    def _emit(self, seq, clip):
+        with self._order_lock:
+            if seq == self._next_release:
+                self._output(clip)
+            else:
+                self._held.setdefault(seq, []).append(clip)
+
+    def _complete(self, seq):
+        with self._order_lock:
+            self._finished.add(seq)
+            while self._next_release in self._finished:
+                self._finished.discard(self._next_release)
+                self._next_release += 1
+                # The next message becomes the head: release what it already produced
+                for clip in self._held.pop(self._next_release, []):
+                    self._output(clip)
+
+    def stats(self):
+        with self._order_lock:
+            held = sum(len(clips) for clips in self._held.values())
+        return {
+            "backlog": self.backlog,
+            "in_flight": self.in_flight,
+            "held_clips": held,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "max_backlog_seen": self.max_backlog_seen,
+        }
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    """Write via a temp file in the same directory + os.replace, so readers never see a half-written file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+class WriteBehindSaver:
+    """
+    Coalesces save requests and runs `write()` on a background thread.
+    A write happens `delay_s` after the last request, but never later than `max_delay_s` after the
+    first unsaved one, so a dragged slider still lands on disk. `flush()` writes synchronously if
+    anything is pending (used on shutdown).
+    """
+
+    def __init__(self, write, delay_s=0.5, max_delay_s=3.0, name="WriteBehindSaver"):
+        self._write = write
+        self.delay_s = delay_s
+        self.max_delay_s = max_delay_s
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._first_request = None
+        self._last_request = None
+        self._stopped = False
+
+        # Metrics
+        self.requests = 0
+        self.writes = 0
+        self.errors = 0
+        self.last_write_s = 0.0
+
+        self._thread = threading.Thread(target=self._run, daemon=True, name=name)
+        self._thread.start()
+
+    def request(self):
+        """Mark state dirty; returns immediately."""
+        with self._cond:
+            now = time.monotonic()
+            if self._first_request is None:
+                self._first_request = now
+            self._last_request = now
+            self.requests += 1
+            self._cond.notify()
+
+    @property
+    def pending(self):
+        with self._cond:
+            return self._first_request is not None
+
+    def _due(self):
+        return min(self._last_request + self.delay_s, self._first_request + self.max_delay_s)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._first_request is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self._due() - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopped:
+                    return
+            self._write_pending()
+
+    def _write_pending(self):
+        with self._write_lock:
+            with self._cond:
+                if self._first_request is None:
+                    return
+                self._first_request = self._last_request = None
+            start = time.monotonic()
+            try:
+                self._write()
+                self.writes += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Background save failed: {e}")
+                with self._cond:
+                    # Keep it dirty and retry after a back-off rather than losing the change
+                    if self._first_request is None:
+                        self._first_request = self._last_request = time.monotonic() + self.max_delay_s
+            self.last_write_s = time.monotonic() - start
+
+    def flush(self):
+        self._write_pending()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.flush()
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "requests": self.requests,
+            "writes": self.writes,
+            "errors": self.errors,
+            "last_write_ms": round(self.last_write_s * 1000, 1),
+        }